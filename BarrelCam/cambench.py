@@ -0,0 +1,724 @@
+# Copyright 2022 Simone <sanfe75@gmail.com>
+#
+# Licensed under the Apache License, Version 2.0(the "License"); you may not use this file except
+# in compliance with the License.You may obtain a copy of the License at:
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software distributed under the License is distributed
+# on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the License
+# for the specific language governing permissions and limitations under the License.
+#
+
+"""
+Benchmarks for the cam data model
+
+Run with: python -m BarrelCam.cambench [name ...]
+"""
+
+import copy
+import csv
+import os
+import pickle
+import subprocess
+import sys
+import tempfile
+import timeit
+import tracemalloc
+
+from numpy import allclose, arange, array, array_equal, clip, hypot, linalg, pi, searchsorted
+from numpy.random import default_rng
+
+from BarrelCam import camdata
+
+
+def sample_cam(profiles=10, points=12):
+    """
+    Returns a cam with the given number of profiles, each one with points
+    alternating the sinusoidal and parabolic laws and some linear dwells
+    """
+
+    cam = camdata.Cam()
+    laws = (camdata.CamPoint._LAW_SINUSOIDAL, camdata.CamPoint._LAW_LINEAR, camdata.CamPoint._LAW_PARABOLIC,
+            camdata.CamPoint._LAW_LINEAR)
+    for i in range(profiles):
+        cam_points = []
+        displacement = 30.0 + 50 * i
+        for j in range(1, points + 1):
+            law = laws[j % len(laws)]
+            if law != camdata.CamPoint._LAW_LINEAR:
+                displacement += 20.0 if j % 8 < 4 else -20.0
+            cam_points.append(camdata.CamPoint(int(3600 * j / points) / 10, displacement, law))
+        cam.add_cam(camdata.CamProfile(cam_points, "Cam {0}".format(i + 1)))
+    return cam
+
+
+def bench_polyline(angle_steps=100, number=3):
+    """
+    Compares the list and the vectorized polyline at angle_steps resolution
+    """
+
+    cam = sample_cam()
+    for cam_profile in cam:
+        for complete in (True, False):
+            expected = array(cam_profile.polyline(complete, angle_steps))
+            result = cam_profile.polyline_array(complete, angle_steps)
+            if not array_equal(expected, result):
+                raise AssertionError("polyline_array differs from polyline for {0}".format(cam_profile.label()))
+
+    list_time = timeit.timeit(lambda: [cam_profile.polyline(True, angle_steps) for cam_profile in cam],
+                              number=number) / number
+    cams = [copy.deepcopy(cam) for _ in range(number)]
+    array_time = timeit.timeit(lambda: [cam_profile.polyline_array(True, angle_steps) for cam_profile in cams.pop()],
+                               number=number) / number
+    print("polyline ({0} profiles, {1} steps/degree): list {2:.1f} ms, array {3:.1f} ms, speedup {4:.1f}x"
+          .format(len(cam), angle_steps, list_time * 1000, array_time * 1000, list_time / array_time))
+
+
+def bench_kinematics(angle_steps=100, number=3):
+    """
+    Compares polyline, first_derivative and second_derivative against a single kinematics call
+    """
+
+    cam = sample_cam()
+    for cam_profile in cam:
+        angles, displacements, first, second = cam_profile.kinematics(angle_steps)
+        if not array_equal(array(cam_profile.polyline(True, angle_steps)), array((angles, displacements)).T):
+            raise AssertionError("kinematics displacements differ from polyline for {0}".format(cam_profile.label()))
+        for derivative, expected in ((first, cam_profile.first_derivative(angle_steps)),
+                                     (second, cam_profile.second_derivative(angle_steps))):
+            values = dict(expected)
+            if not allclose([values[angle] for angle in angles.tolist()], derivative):
+                raise AssertionError("kinematics derivatives differ for {0}".format(cam_profile.label()))
+
+    list_time = timeit.timeit(lambda: [(cam_profile.polyline(True, angle_steps),
+                                        cam_profile.first_derivative(angle_steps),
+                                        cam_profile.second_derivative(angle_steps)) for cam_profile in cam],
+                              number=number) / number
+    array_time = timeit.timeit(lambda: [cam_profile.kinematics(angle_steps) for cam_profile in cam],
+                               number=number) / number
+    print("kinematics ({0} profiles, {1} steps/degree): 3 loops {2:.1f} ms, single pass {3:.1f} ms, speedup {4:.1f}x"
+          .format(len(cam), angle_steps, list_time * 1000, array_time * 1000, list_time / array_time))
+
+
+def solve_law_params(law, prev_angle, prev_displacement, angle, displacement):
+    """
+    Returns the law parameters solving the linear system of the boundary conditions
+    """
+
+    if law == camdata.CamPoint._LAW_SINUSOIDAL:
+        a = array([[prev_angle, 1, 0, 0],
+                   [angle, 1, 0, 0],
+                   [0, 0, -1, 1],
+                   [0, 0, 1, 1]])
+        b = array([[-90], [90], [prev_displacement], [displacement]])
+    else:
+        mid_angle = (prev_angle + angle) / 2
+        mid_displacement = (prev_displacement + displacement) / 2
+        a = array([[prev_angle ** 2, prev_angle, 1, 0, 0, 0],
+                   [2 * prev_angle, 1, 0, 0, 0, 0],
+                   [mid_angle ** 2, mid_angle, 1, 0, 0, 0],
+                   [0, 0, 0, mid_angle ** 2, mid_angle, 1],
+                   [0, 0, 0, angle ** 2, angle, 1],
+                   [0, 0, 0, 2 * angle, 1, 0]])
+        b = array([[prev_displacement], [0], [mid_displacement], [mid_displacement], [displacement], [0]])
+    return linalg.solve(a, b)[:, 0]
+
+
+def bench_law_params(segments=2000, number=3):
+    """
+    Checks the closed form law parameters against the linear system solution and compares the timings
+    """
+
+    generator = default_rng(20140112)
+    cases = []
+    for _ in range(segments):
+        prev_angle, angle = sorted(generator.integers(0, 3600, 2, endpoint=True) / 10)
+        if angle - prev_angle < 1:
+            continue
+        prev_displacement, displacement = generator.integers(0, 2000, 2) / 10
+        for law in (camdata.CamPoint._LAW_SINUSOIDAL, camdata.CamPoint._LAW_PARABOLIC):
+            cases.append((law, prev_angle, prev_displacement, angle, displacement))
+
+    for case in cases:
+        expected = solve_law_params(*case)
+        result = camdata.law_params.__wrapped__(*case)
+        # the parabolic constant terms grow with angle ** 2, scale the tolerance on the largest parameter
+        if not allclose(result, expected, rtol=1e-9, atol=1e-9 * abs(expected).max()):
+            raise AssertionError("closed form parameters differ for {0}: {1} != {2}".format(case, result, expected))
+
+    solve_time = timeit.timeit(lambda: [solve_law_params(*case) for case in cases], number=number) / number
+    closed_time = timeit.timeit(lambda: [camdata.law_params.__wrapped__(*case) for case in cases],
+                                number=number) / number
+    cached_time = timeit.timeit(lambda: [camdata.law_params(*case) for case in cases], number=number) / number
+    print("law params ({0} segments): linalg {1:.1f} ms, closed form {2:.1f} ms, cached {3:.1f} ms"
+          .format(len(cases), solve_time * 1000, closed_time * 1000, cached_time * 1000))
+
+
+def bench_sample_cache(reads=20, number=3):
+    """
+    Simulates the consumers reading the samples between two edits and reports the cache counters
+    """
+
+    cam = sample_cam()
+
+    def read_and_edit():
+        for _ in range(reads):
+            for cam_profile in cam:
+                cam_profile.polyline_array(True)
+                cam_profile.polyline_array(False)
+        for cam_profile in cam:
+            cam_profile.move(0.1)
+
+    edit_time = timeit.timeit(read_and_edit, number=number) / number
+    hits, misses, size = zip(*[cam_profile.sample_cache_info() for cam_profile in cam])
+    print("sample cache ({0} reads per edit): {1:.1f} ms per edit, {2} hits, {3} misses"
+          .format(reads, edit_time * 1000, sum(hits), sum(misses)))
+
+
+def bench_drag(sizes=(12, 48, 192, 768), moves=50, angle_steps=100):
+    """
+    Measures the resampling time while a single point is dragged in profiles of growing size
+    """
+
+    for size in sizes:
+        cam_profile = sample_cam(1, size)[0]
+        cam_profile.polyline_array(True, angle_steps)
+        point = cam_profile[size // 2]
+
+        def drag():
+            for i in range(moves):
+                point.set_displacement(point.displacement() + (0.1 if i % 2 else -0.1))
+                cam_profile.polyline_array(True, angle_steps)
+
+        def rebuild():
+            for i in range(moves):
+                camdata.CamProfile([camdata.CamPoint(p.angle(), p.displacement(), p.law()) for p in cam_profile],
+                                   "Copy").polyline_array(True, angle_steps)
+
+        drag_time = timeit.timeit(drag, number=1) / moves
+        rebuild_time = timeit.timeit(rebuild, number=1) / moves
+        print("drag ({0} points, {1} steps/degree): incremental {2:.2f} ms, full {3:.2f} ms per move"
+              .format(size, angle_steps, drag_time * 1000, rebuild_time * 1000))
+
+
+class DictCamPoint(object):
+    """
+    A point with the attributes in a per-instance dictionary, as CamPoint before __slots__
+    """
+
+    def __init__(self, angle, displacement=0.0, law=0):
+        self.__angle = angle
+        self.__displacement = displacement
+        self.__law = law
+        self.__profile = None
+
+
+def bench_memory(points=100000):
+    """
+    Measures the memory used by every point with and without __slots__
+    """
+
+    for point_class in (DictCamPoint, camdata.CamPoint):
+        tracemalloc.start()
+        start, _ = tracemalloc.get_traced_memory()
+        cam_points = [point_class(i / 10, float(i % 100), 1) for i in range(points)]
+        stop, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print("memory ({0}): {1:.0f} bytes per point".format(point_class.__name__, (stop - start) / len(cam_points)))
+
+
+def bench_import(heavy_modules=("cadquery", "ezdxf", "PySide6", "matplotlib"), number=5):
+    """
+    Measures the import time of the data model in a new interpreter and checks that
+    the export and GUI libraries are not imported with it
+    """
+
+    code = ("import sys, time; start = time.perf_counter(); import BarrelCam.camdata; "
+            "print(time.perf_counter() - start); print(' '.join(sorted(sys.modules)))")
+    times = []
+    for _ in range(number):
+        output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout
+        elapsed, modules = output.splitlines()
+        times.append(float(elapsed))
+        imported = [module for module in heavy_modules if module in modules.split()]
+        if imported:
+            raise AssertionError("importing camdata imports {0}".format(", ".join(imported)))
+    print("import camdata: {0:.1f} ms".format(min(times) * 1000))
+
+
+def save_pickle(cam, file_name):
+    """
+    Saves the cam in the pickled version 2 format
+    """
+
+    with open(file_name, 'wb') as fh:
+        for value in (camdata.MAGIC_NUMBER, 2, cam.angle_steps(), cam.displacement_steps(), cam.speed(), cam.radius(),
+                      list(cam)):
+            pickle.dump(value, fh)
+
+
+def save_cxf_records(cam, file_name):
+    """
+    Saves the cam in the version 2 cxf format, one pickled record per point
+    """
+
+    with open(file_name, 'wb') as fh:
+        for value in (camdata.MAGIC_NUMBER, 2, cam.angle_steps(), cam.displacement_steps(), cam.speed(), cam.radius()):
+            pickle.dump(value, fh)
+        for cam_profile in cam:
+            for value in ("<cam_profile>", cam_profile.label(), cam_profile.color(), cam_profile.height(),
+                          cam_profile.depth()):
+                pickle.dump(value, fh)
+            for point in cam_profile:
+                pickle.dump([point.angle(), point.displacement(), point.law()], fh)
+            pickle.dump("</cam_profile>", fh)
+        pickle.dump("</cam>", fh)
+
+
+def same_cam(cam, other):
+    """
+    Returns True if the two cams have the same settings, profiles and points
+    """
+
+    def points(cam_profile):
+        return [(point.angle(), point.displacement(), point.law()) for point in cam_profile]
+
+    return ((cam.speed(), cam.radius(), cam.angle_steps(), cam.displacement_steps()) ==
+            (other.speed(), other.radius(), other.angle_steps(), other.displacement_steps()) and
+            [(p.label(), p.color(), p.height(), p.depth(), points(p)) for p in cam] ==
+            [(p.label(), p.color(), p.height(), p.depth(), points(p)) for p in other])
+
+
+def bench_load(profiles=50, points=5000, number=3):
+    """
+    Compares the load of the pickled version 2 and of the version 3 files
+    """
+
+    cam = sample_cam(profiles, points)
+    with tempfile.TemporaryDirectory() as directory:
+        file_names = {}
+        for version, save in ((2, save_pickle), (3, lambda cam, file_name: cam.save())):
+            file_names[version] = os.path.join(directory, "v{0}.cam".format(version))
+            cam.set_file_name(file_names[version])
+            save(cam, file_names[version])
+            loaded = camdata.Cam()
+            loaded.load(file_names[version])
+            if not same_cam(cam, loaded):
+                raise AssertionError("version {0} file loaded a different cam".format(version))
+
+        times = {version: timeit.timeit(lambda: camdata.Cam().load(file_name), number=number) / number
+                 for version, file_name in file_names.items()}
+        sizes = {version: os.path.getsize(file_name) / 1024 for version, file_name in file_names.items()}
+    print("load ({0} profiles, {1} points): version 2 {2:.1f} ms {3:.0f} KiB, version 3 {4:.1f} ms {5:.0f} KiB"
+          .format(profiles, points, times[2] * 1000, sizes[2], times[3] * 1000, sizes[3]))
+
+
+def bench_cxf(profiles=50, points=5000, number=3):
+    """
+    Compares the load of the per-record version 2 and of the block framed version 3 cxf files
+    """
+
+    cam = sample_cam(profiles, points)
+
+    def load_cxf(file_name):
+        loaded = camdata.Cam()
+        loaded.set_file_name(file_name)
+        loaded.load_cxf_file(file_name)
+        return loaded
+
+    with tempfile.TemporaryDirectory() as directory:
+        file_names = {}
+        for version, save in ((2, save_cxf_records), (3, lambda cam, file_name: cam.save_cxf(file_name))):
+            file_names[version] = os.path.join(directory, "v{0}.cxf".format(version))
+            save(cam, file_names[version])
+            if not same_cam(cam, load_cxf(file_names[version])):
+                raise AssertionError("version {0} cxf file loaded a different cam".format(version))
+
+        times = {version: timeit.timeit(lambda: load_cxf(file_name), number=number) / number
+                 for version, file_name in file_names.items()}
+    print("cxf load ({0} profiles, {1} points): records {2:.1f} ms, blocks {3:.1f} ms, speedup {4:.1f}x"
+          .format(profiles, points, times[2] * 1000, times[3] * 1000, times[2] / times[3]))
+
+
+def save_csv_rows(cam, file_name, decimal_point=".", angle_steps=camdata.angle_steps):
+    """
+    Saves the CSV one formatted row at a time, as save_2D_CSV before the chunked formatting
+    """
+
+    with open(file_name, 'w', newline='') as csvfile:
+        writer = csv.writer(csvfile, delimiter=';', quotechar='|', quoting=csv.QUOTE_MINIMAL)
+        for cam_profile in cam:
+            for point in cam_profile.polyline_array(False, angle_steps):
+                angle = '{0:.3f}'.format(point[0]).replace('.', decimal_point)
+                displacement = '{0:.3f}'.format(point[1]).replace('.', decimal_point)
+                writer.writerow([angle, displacement])
+
+
+def bench_csv(profiles=10, angle_steps=100, number=3):
+    """
+    Checks the chunked CSV export against the row by row export and compares the timings
+    at angle_steps resolution, the wide layout is timed too
+    """
+
+    cam = sample_cam(profiles, 24)
+    with tempfile.TemporaryDirectory() as directory:
+        rows_name = os.path.join(directory, "rows.csv")
+        chunks_name = os.path.join(directory, "chunks.csv")
+        wide_name = os.path.join(directory, "wide.csv")
+        for decimal_point in (".", ","):
+            save_csv_rows(cam, rows_name, decimal_point, angle_steps)
+            cam.save_2D_CSV(chunks_name, decimal_point, angle_steps=angle_steps)
+            with open(rows_name, 'rb') as rows, open(chunks_name, 'rb') as chunks:
+                if rows.read() != chunks.read():
+                    raise AssertionError("chunked CSV differs with decimal point {0}".format(decimal_point))
+
+        rows_time = timeit.timeit(lambda: save_csv_rows(cam, rows_name, ",", angle_steps), number=number) / number
+        chunks_time = timeit.timeit(lambda: cam.save_2D_CSV(chunks_name, ",", angle_steps=angle_steps),
+                                    number=number) / number
+        wide_time = timeit.timeit(lambda: cam.save_2D_CSV(wide_name, ",", "wide", angle_steps), number=number) / number
+        size = os.path.getsize(chunks_name) / 1024 ** 2
+    print("csv ({0} profiles, {1} steps/degree, {2:.1f} MiB): rows {3:.1f} ms, chunks {4:.1f} ms, wide {5:.1f} ms, "
+          "speedup {6:.1f}x".format(profiles, angle_steps, size, rows_time * 1000, chunks_time * 1000,
+                                    wide_time * 1000, rows_time / chunks_time))
+
+
+def save_dxf_query(cam, file_name):
+    """
+    Saves the DXF looking up every polyline in the modelspace, as save_2D_DXF before the layer attributes,
+    from the same template
+    """
+
+    from BarrelCam.camdxf import color_to_ACI, new_drawing
+
+    polylines = []
+    drawing = new_drawing('AC1015')
+    model_space = drawing.modelspace()
+    for i, cam_profile in enumerate(cam):
+        drawing.layers.add(name=cam_profile.label())
+        layer = drawing.layers.get(cam_profile.label())
+        layer.set_color(color_to_ACI(cam_profile.color()))
+        polylines.append([])
+        for point in cam_profile.polyline_array(True):
+            polylines[i].append((-2 * pi * cam.radius() * point[0] / 360, point[1]))
+        model_space.add_lwpolyline(polylines[i])
+        polyline = model_space.query('LWPOLYLINE')[i]
+        polyline.dxf.layer = cam_profile.label()
+    drawing.saveas(file_name)
+
+
+def dxf_entities(file_name):
+    """
+    Returns the layer, the layer color and the vertices of every LWPOLYLINE in the DXF file
+    """
+
+    import ezdxf
+
+    drawing = ezdxf.readfile(file_name)
+    return [(polyline.dxf.layer, drawing.layers.get(polyline.dxf.layer).color, polyline.get_points("xy"))
+            for polyline in drawing.modelspace().query('LWPOLYLINE')]
+
+
+def bench_dxf(sizes=(1, 10, 100), number=3):
+    """
+    Checks the DXF export against the modelspace lookup export and times both for growing numbers of profiles,
+    the time per profile of a linear export does not grow with the profiles
+    """
+
+    with tempfile.TemporaryDirectory() as directory:
+        query_name = os.path.join(directory, "query.dxf")
+        export_name = os.path.join(directory, "export.dxf")
+        cam = sample_cam(3)
+        save_dxf_query(cam, query_name)
+        cam.save_2D_DXF(export_name)
+        if dxf_entities(query_name) != dxf_entities(export_name):
+            raise AssertionError("DXF export differs from the modelspace lookup export")
+
+        for size in sizes:
+            cam = sample_cam(size)
+            for cam_profile in cam:
+                cam_profile.polyline_array(True)
+            query_time = timeit.timeit(lambda: save_dxf_query(cam, query_name), number=number) / number
+            export_time = timeit.timeit(lambda: cam.save_2D_DXF(export_name), number=number) / number
+            print("dxf ({0} profiles): lookup {1:.1f} ms, {2:.2f} ms per profile, export {3:.1f} ms, "
+                  "{4:.2f} ms per profile".format(size, query_time * 1000, query_time * 1000 / size,
+                                                  export_time * 1000, export_time * 1000 / size))
+
+
+def chord_distances(polyline, indexes, radius):
+    """
+    Returns the distance of every sample of polyline from the chord of the kept samples enclosing it,
+    on the polyline unrolled on the cylinder of the radius
+    """
+
+    points = polyline * (2 * pi * radius / 360, 1)
+    chord = clip(searchsorted(indexes, arange(len(points)), side="right") - 1, 0, len(indexes) - 2)
+    start = points[indexes[chord]]
+    end = points[indexes[chord + 1]]
+    direction = end - start
+    relative = points - start
+    t = clip((relative * direction).sum(axis=1) / (direction * direction).sum(axis=1), 0, 1)
+    return hypot(*(relative - t[:, None] * direction).T)
+
+
+def bench_decimate(profiles=10, tolerances=(0.001, 0.01, 0.1), number=3):
+    """
+    Times the decimation of the complete polylines, reports the vertex reduction and the maximum deviation
+    and checks it against the distances of every sample from the decimated polylines
+    """
+
+    cam = sample_cam(profiles)
+    with tempfile.TemporaryDirectory() as directory:
+        file_name = os.path.join(directory, "cam.dxf")
+        cam.save_2D_DXF(file_name)
+        print("decimate: dxf {0} kB".format(os.path.getsize(file_name) // 1024))
+        for tolerance in tolerances:
+            seconds = timeit.timeit(lambda: cam.decimated_polylines(tolerance), number=number) / number
+            polylines, samples, deviation = cam.decimated_polylines(tolerance)
+            measured = 0.0
+            for cam_profile in cam:
+                polyline = cam_profile.polyline_array(True)
+                indexes, _ = camdata.decimate(polyline, cam.radius(), tolerance)
+                measured = max(measured, chord_distances(polyline, indexes, cam.radius()).max())
+            if measured > tolerance or abs(measured - deviation) > 1e-9:
+                raise AssertionError("decimation deviation {0} measured {1}".format(deviation, measured))
+            cam.save_2D_DXF(file_name, tolerance)
+            print("decimate ({0} mm): {1:.1f} ms, {2} vertices reduced to {3}, max deviation {4:.4f} mm, "
+                  "dxf {5} kB".format(tolerance, seconds * 1000, samples, sum(len(polyline) for polyline in polylines),
+                                      deviation, os.path.getsize(file_name) // 1024))
+
+
+def bench_splines(profiles=10, tolerances=(0.01, 0.001), number=1):
+    """
+    Times the DXF export with splines against the polylines, reads the splines back from the file and checks
+    their distance from the samples of the segments
+    """
+
+    import ezdxf
+    from BarrelCam import camdxf
+
+    cam = sample_cam(profiles)
+    with tempfile.TemporaryDirectory() as directory:
+        file_name = os.path.join(directory, "cam.dxf")
+        seconds = timeit.timeit(lambda: cam.save_2D_DXF(file_name), number=number) / number
+        print("splines: polylines {0:.1f} ms, dxf {1} kB".format(seconds * 1000, os.path.getsize(file_name) // 1024))
+        for tolerance in tolerances:
+            seconds = timeit.timeit(lambda: cam.save_2D_DXF(file_name, tolerance, True), number=number) / number
+            _, message = cam.save_2D_DXF(file_name, tolerance, True)
+            splines = ezdxf.readfile(file_name).modelspace().query("SPLINE")
+            measured = 0.0
+            for cam_profile in cam:
+                profile_splines = iter(spline for spline in splines if spline.dxf.layer == cam_profile.label())
+                prev_point = camdata.CamPoint(0, cam_profile[-1].displacement())
+                for point in cam_profile:
+                    if point.law() != camdata.CamPoint._LAW_LINEAR:
+                        samples = cam_profile.segment_array(point, prev_point, True)
+                        unrolled = samples * (-2 * pi * cam.radius() / 360, 1)
+                        spline = next(profile_splines).construction_tool()
+                        measured = max(measured, camdxf.spline_deviation(spline, unrolled))
+                    prev_point = point
+            if measured > tolerance:
+                raise AssertionError("spline deviation {0} over {1}".format(measured, tolerance))
+            print("splines ({0} mm): {1:.1f} ms, dxf {2} kB, {3}".format(
+                tolerance, seconds * 1000, os.path.getsize(file_name) // 1024, message.split(", ", 1)[1]))
+
+
+def bench_templates(number=20):
+    """
+    Times a new drawing parsed from the template file against one built from the cached template tags
+    """
+
+    import ezdxf
+    from BarrelCam import camdxf
+
+    for dxf_version in camdxf.DXF_VERSIONS:
+        template_name = os.path.join(camdxf.TEMPLATE_DIR, dxf_version + ".dxf")
+        read_time = timeit.timeit(lambda: ezdxf.readfile(template_name), number=number) / number
+        camdxf.new_drawing(dxf_version)
+        cached_time = timeit.timeit(lambda: camdxf.new_drawing(dxf_version), number=number) / number
+        print("templates ({0}): read {1:.1f} ms, cached {2:.1f} ms".format(dxf_version, read_time * 1000,
+                                                                            cached_time * 1000))
+
+
+def bench_spines(pitches=(6, 3, 1), tolerances=(0.01, 0.005, 0.001)):
+    """
+    Compares the STEP spines sampled every pitch degrees with the adaptive ones: spine points,
+    distance of the profile samples from the path and time of the sweep of one profile
+    """
+
+    from BarrelCam import camstep
+
+    cam = sample_cam(1, 4)
+    cam_profile = cam[0]
+    points = cam_profile.polyline_array(True)
+    for label, pitch, tolerance in ([("pitch {0}".format(pitch), pitch, None) for pitch in pitches] +
+                                    [("tolerance {0} mm".format(tolerance), 6, tolerance) for tolerance in tolerances]):
+        start = timeit.default_timer()
+        polyline, aux, deviation = camstep.profile_spines(cam.radius(), points, cam_profile.depth(), pitch, tolerance)
+        spine_time = timeit.default_timer() - start
+        if deviation is None:
+            deviation = camstep.spine_deviations(cam.radius(), points, range(0, len(points), pitch * 10)).max()
+        start = timeit.default_timer()
+        solid = camstep.sweep(cam.radius(), cam_profile.depth(), cam_profile.height(), polyline, aux)
+        sweep_time = timeit.default_timer() - start
+        print("spines ({0}): {1} points, max deviation {2:.4f} mm, spines {3:.0f} ms, sweep {4:.0f} ms, "
+              "volume {5:.0f} mm3".format(label, len(polyline), deviation, spine_time * 1000, sweep_time * 1000,
+                                          solid.Volume()))
+
+
+def bench_cache(profiles=3, angle_pitch=6):
+    """
+    Times the STEP export with an empty solid cache, with every solid cached, after a label and color change
+    and after moving one profile
+    """
+
+    from BarrelCam import camcache
+
+    cam = sample_cam(profiles, 4)
+    with tempfile.TemporaryDirectory() as directory:
+        cache = camcache.SolidCache(os.path.join(directory, "solids"))
+        file_name = os.path.join(directory, "cam.stp")
+        for label in ("empty", "cached", "relabeled", "moved"):
+            if label == "relabeled":
+                cam[0].set_label("Relabeled")
+                cam[0].set_color("#ff0000")
+            elif label == "moved":
+                cam[-1].move(5.0)
+            start = timeit.default_timer()
+            _, message = cam.save_3D_STP(file_name, angle_pitch, 1, None, cache)
+            seconds = timeit.default_timer() - start
+            print("cache ({0}): {1:.2f} s, {2}".format(label, seconds, message.split(", ", 1)[1]))
+        count, removed = cache.clear()
+        print("cache: cleared {0} solids, {1} kB".format(count, removed // 1024))
+
+
+def bench_congruent(copies=3, angle_pitch=6):
+    """
+    Times the STEP export of one profile and of the profile with copies moved along the axis,
+    the copies are translated from the solid of the profile instead of swept
+    """
+
+    cam = sample_cam(1, 4)
+    with tempfile.TemporaryDirectory() as directory:
+        file_name = os.path.join(directory, "cam.stp")
+        for size in (1, copies + 1):
+            while len(cam) < size:
+                cam_profile = copy.deepcopy(cam[0])
+                cam_profile.set_label("Copy {0}".format(len(cam)))
+                cam_profile.move(60.0 * len(cam))
+                cam.add_cam(cam_profile)
+            start = timeit.default_timer()
+            _, message = cam.save_3D_STP(file_name, angle_pitch, 1)
+            print("congruent ({0} profiles): {1:.2f} s, {2}".format(size, timeit.default_timer() - start, message))
+
+
+def bench_stl(profiles=10, tolerances=(None, 0.01), bore=40.0, number=3):
+    """
+    Times the STL export, checks that every edge of the drum mesh is shared by two triangles turned the opposite
+    way, that the drum encloses the cylinder volume minus the grooves and the bore, and that the export does not
+    import cadquery
+    """
+
+    from BarrelCam import camstl
+
+    # the grooves of the first cam run out of the drum face, the grooves of the second one are inside the drum
+    cams = (sample_cam(profiles), sample_cam(profiles, 4))
+    with tempfile.TemporaryDirectory() as directory:
+        file_name = os.path.join(directory, "cam.stl")
+        for tolerance in tolerances:
+            seconds = timeit.timeit(lambda: cams[0].save_3D_STL(file_name, tolerance, bore=bore),
+                                    number=number) / number
+            for cam in cams:
+                triangles = camstl.drum_triangles(cam, tolerance, bore=bore)
+                edges = [tuple(edge) for edge in triangles[:, [0, 1, 1, 2, 2, 0]].reshape(-1, 6).tolist()]
+                if sorted(edges) != sorted(edge[3:] + edge[:3] for edge in edges):
+                    raise AssertionError("STL drum is not closed")
+            radius, length = cam.radius(), camstl.default_drum_length(cam)
+            grooves = sum(abs(camstl.signed_volume(camstl.groove_triangles(radius, cam_profile, tolerance)))
+                          for cam_profile in cam)
+            expected = pi * (radius ** 2 - (bore / 2) ** 2) * length - grooves
+            volume = camstl.signed_volume(triangles)
+            if abs(volume - expected) > 2e-4 * expected:
+                raise AssertionError("STL drum volume {0:.0f} mm3 instead of {1:.0f} mm3".format(volume, expected))
+            _, message = cams[0].save_3D_STL(file_name, tolerance, bore=bore)
+            print("stl ({0}): {1:.1f} ms, {2} kB, {3}, drum of the inner grooves {4:.0f} mm3, expected {5:.0f} mm3"
+                  .format("every sample" if tolerance is None else "{0} mm".format(tolerance), seconds * 1000,
+                          os.path.getsize(file_name) // 1024, message.split(", ", 1)[1], volume, expected))
+
+    code = ("import sys; from BarrelCam import cambench; cambench.sample_cam(1).save_3D_STL(sys.argv[1]); "
+            "print('cadquery' in sys.modules)")
+    with tempfile.TemporaryDirectory() as directory:
+        output = subprocess.run([sys.executable, "-c", code, os.path.join(directory, "cam.stl")],
+                                capture_output=True, text=True, check=True).stdout
+    if output.strip() != "False":
+        raise AssertionError("the STL export imports cadquery")
+
+
+def bench_drum(sizes=(1, 2, 4), angle_pitch=6, bore=40.0):
+    """
+    Compares the cut of every groove and the bore from the drum in one boolean with sequential cuts,
+    checks that both remove the same volume as the STL drum and times the STEP export of the drum
+    """
+
+    from BarrelCam import camstep, camstl
+
+    for size in sizes:
+        cam = sample_cam(size, 4)
+        drum_length = 50.0 * size + 40
+        body, bore_tool = camstep.drum_body(cam, drum_length, bore)
+        spines = [camstep.profile_spines(cam.radius(), cam_profile.polyline_array(True), cam_profile.depth(),
+                                         angle_pitch) for cam_profile in cam]
+        tools = [camstep.sweep(*arguments) for arguments in
+                 camstep.sweep_arguments(cam.radius(), cam, spines, camstep.drum_margin)] + [bore_tool]
+
+        start = timeit.default_timer()
+        single = body.cut(*tools)
+        single_time = timeit.default_timer() - start
+        start = timeit.default_timer()
+        sequential = body
+        for tool in tools:
+            sequential = sequential.cut(tool)
+        sequential_time = timeit.default_timer() - start
+        # the default integration of the volume is not accurate enough on the swept faces
+        removed = body.Volume(1e-7) - single.Volume(1e-7)
+        if not single.isValid() or abs(removed - body.Volume(1e-7) + sequential.Volume(1e-7)) > 1e-6 * removed:
+            raise AssertionError("the single cut differs from the sequential cuts")
+        # the STL drum has the same grooves, sampled at every step instead of swept along splines
+        stl_volume = camstl.signed_volume(camstl.drum_triangles(cam, None, drum_length, bore))
+        if abs(stl_volume - single.Volume(1e-7)) > 1e-4 * single.Volume(1e-7):
+            raise AssertionError("the STL drum differs from the STEP drum")
+
+        with tempfile.TemporaryDirectory() as directory:
+            start = timeit.default_timer()
+            _, message = cam.save_3D_STP(os.path.join(directory, "cam.stp"), angle_pitch, 1,
+                                         drum_length=drum_length, bore=bore)
+            export_time = timeit.default_timer() - start
+        print("drum ({0} grooves): one cut {1:.2f} s, sequential cuts {2:.2f} s, removed {3:.0f} mm3, "
+              "export {4:.2f} s, {5}".format(size, single_time, sequential_time, removed, export_time,
+                                             message.split(", ", 1)[1]))
+
+
+BENCHMARKS = {"polyline": bench_polyline,
+              "kinematics": bench_kinematics,
+              "law_params": bench_law_params,
+              "sample_cache": bench_sample_cache,
+              "drag": bench_drag,
+              "memory": bench_memory,
+              "import": bench_import,
+              "load": bench_load,
+              "cxf": bench_cxf,
+              "csv": bench_csv,
+              "dxf": bench_dxf,
+              "decimate": bench_decimate,
+              "splines": bench_splines,
+              "templates": bench_templates,
+              "spines": bench_spines,
+              "cache": bench_cache,
+              "congruent": bench_congruent,
+              "stl": bench_stl,
+              "drum": bench_drum}
+
+
+if __name__ == "__main__":
+    for name in sys.argv[1:] or BENCHMARKS:
+        BENCHMARKS[name]()
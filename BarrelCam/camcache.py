@@ -0,0 +1,151 @@
+# Copyright 2022 Simone <sanfe75@gmail.com>
+#
+# Licensed under the Apache License, Version 2.0(the "License"); you may not use this file except
+# in compliance with the License.You may obtain a copy of the License at:
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software distributed under the License is distributed
+# on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the License
+# for the specific language governing permissions and limitations under the License.
+#
+
+"""
+On disk cache of the swept solids of the STEP export
+
+Every solid is a BREP file named after the hash of everything that affects its geometry,
+the least recently used files are removed when the cache grows over its size
+"""
+
+import hashlib
+import os
+
+from BarrelCam import camdata
+
+CACHE_DIR = os.environ.get("BARRELCAM_CACHE", os.path.join(os.path.expanduser("~"), ".cache", "BarrelCam", "solids"))
+CACHE_SUFFIX = ".brep"
+CACHE_VERSION = 1  # changes when the sweep builds different solids from the same profile
+cache_size = 256 * 2 ** 20  # bytes of solids kept
+
+
+class SolidCache(object):
+    """
+    Content addressed cache of BREP solids
+    """
+
+    def __init__(self, directory=CACHE_DIR, size=None):
+        """
+        Creates the cache in directory keeping up to size bytes, cache_size if None
+        """
+
+        self.__directory = directory
+        self.__size = size
+
+    def clear(self):
+        """
+        Removes every solid of the cache, returns the number of files and bytes removed
+        """
+
+        count = removed = 0
+        for entry in self.__entries():
+            try:
+                size = entry.stat().st_size
+                os.remove(entry.path)
+            except FileNotFoundError:
+                continue
+            count += 1
+            removed += size
+        return count, removed
+
+    def directory(self):
+        """
+        Returns the directory of the cache
+        """
+
+        return self.__directory
+
+    def get(self, key):
+        """
+        Returns the BREP bytes stored with key, None if the cache does not have them
+        """
+
+        file_name = self.__file_name(key)
+        try:
+            with open(file_name, 'rb') as fh:
+                data = fh.read()
+            # the modification time orders the solids by their last use
+            os.utime(file_name)
+        except FileNotFoundError:
+            return None
+        return data
+
+    def put(self, key, data):
+        """
+        Stores the BREP bytes with key and removes the least recently used solids over the size of the cache
+        """
+
+        os.makedirs(self.__directory, exist_ok=True)
+        camdata.write_file(self.__file_name(key), [data])
+        self.__evict()
+
+    def size(self):
+        """
+        Returns the bytes of solids kept
+        """
+
+        return cache_size if self.__size is None else self.__size
+
+    def __entries(self):
+        """
+        Returns the solid files of the cache
+        """
+
+        try:
+            with os.scandir(self.__directory) as entries:
+                return [entry for entry in entries if entry.name.endswith(CACHE_SUFFIX) and entry.is_file()]
+        except FileNotFoundError:
+            return []
+
+    def __evict(self):
+        """
+        Removes the least recently used solids until the cache is within its size
+        """
+
+        files = []
+        for entry in self.__entries():
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            files.append((stat.st_mtime_ns, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.size():
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def __file_name(self, key):
+        """
+        Returns the full name of the solid file of key
+        """
+
+        return os.path.join(self.__directory, key + CACHE_SUFFIX)
+
+
+def profile_key(cam, cam_profile, angle_pitch, tolerance=None, margin=0):
+    """
+    Returns the cache key of the solid swept from cam_profile: a hash of its points and laws, height, depth,
+    the cam radius and angle steps, the spine sampling and the margin of the drum tools,
+    the label and the color do not change the key
+    """
+
+    digest = hashlib.sha256()
+    sampling = ("tolerance", tolerance) if tolerance is not None else ("pitch", angle_pitch)
+    digest.update(repr((CACHE_VERSION, cam.radius(), cam.angle_steps(), cam_profile.height(), cam_profile.depth(),
+                        sampling, margin)).encode("ascii"))
+    digest.update(camdata.points_to_records(cam_profile).tobytes())
+    return digest.hexdigest()
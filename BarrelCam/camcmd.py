@@ -14,6 +14,8 @@ import copy
 
 from PySide6.QtGui import QUndoCommand
 
+from BarrelCam import camjournal
+
 
 class CamAddCommand(QUndoCommand):
     """
@@ -30,6 +32,7 @@ class CamAddCommand(QUndoCommand):
         self.main_window = main_window
         self.cam_profile = cam_profile
         self.text = text
+        self.deltas = []
 
     def redo(self):
         """
@@ -37,6 +40,7 @@ class CamAddCommand(QUndoCommand):
         """
 
         self.main_window.cam.add_cam(self.cam_profile)
+        self.deltas = [camjournal.profile_add_delta(self.cam_profile)]
         self.main_window.scene.update_scene()
         self.main_window.cam.set_dirty(True)
         self.main_window.update_widgets()
@@ -47,6 +51,7 @@ class CamAddCommand(QUndoCommand):
         Undo: Removes the added profile
         """
 
+        self.deltas = [camjournal.profile_delete_delta(self.main_window.cam.index(self.cam_profile))]
         self.main_window.cam.del_cam(self.cam_profile)
         self.main_window.scene.update_scene()
         self.main_window.cam.set_dirty(True)
@@ -70,6 +75,7 @@ class CamCommand(QUndoCommand):
         self.original_cam = copy.deepcopy(cam)
         self.edited_cam = edited_cam
         self.text = text
+        self.deltas = []
 
     def undo(self):
         """
@@ -83,6 +89,10 @@ class CamCommand(QUndoCommand):
             cam_profile.set_depth(self.original_cam[i].depth())
             cam_profile.set_height(self.original_cam[i].height())
             cam_profile.check_cam()
+        self.deltas = [camjournal.cam_set_delta(self.cam)]
+        for cam_profile in self.cam:
+            self.deltas += [camjournal.profile_set_delta(self.cam, cam_profile),
+                            camjournal.check_delta(self.cam, cam_profile)]
         self.main_window.scene.update_scene()
         self.main_window.cam.set_dirty(True)
         self.main_window.update_widgets()
@@ -99,6 +109,10 @@ class CamCommand(QUndoCommand):
             cam_profile.set_depth(self.edited_cam[i].depth())
             cam_profile.set_height(self.edited_cam[i].height())
             cam_profile.check_cam()
+        self.deltas = [camjournal.cam_set_delta(self.cam)]
+        for cam_profile in self.cam:
+            self.deltas += [camjournal.profile_set_delta(self.cam, cam_profile),
+                            camjournal.check_delta(self.cam, cam_profile)]
         self.main_window.scene.update_scene()
         self.main_window.cam.set_dirty(True)
         self.main_window.update_widgets()
@@ -122,6 +136,7 @@ class CamEditCommand(QUndoCommand):
         self.original_cam_profile = copy.deepcopy(cam_profile)
         self.edited_cam_profile = edited_cam_profile
         self.text = text
+        self.deltas = []
 
     def undo(self):
         """
@@ -151,6 +166,7 @@ class CamEditCommand(QUndoCommand):
 
         self.cam_profile.set_label(cam_profile.label())
         self.cam_profile.set_color(cam_profile.color())
+        self.deltas = [camjournal.profile_set_delta(self.main_window.cam, self.cam_profile)]
 
 
 class CamMirrorCommand(QUndoCommand):
@@ -167,6 +183,7 @@ class CamMirrorCommand(QUndoCommand):
 
         self.main_window = main_window
         self.text = text
+        self.deltas = [camjournal.mirror_delta()]
 
     def redo(self):
         """
@@ -208,6 +225,7 @@ class CamMoveCommand(QUndoCommand):
         self.cam_profiles = cam_profiles
         self.translation = translation
         self.text = text
+        self.deltas = []
 
     def redo(self):
         """
@@ -216,6 +234,8 @@ class CamMoveCommand(QUndoCommand):
 
         for cam_profile in self.cam_profiles:
             cam_profile.move(self.translation)
+        self.deltas = [camjournal.profile_move_delta(self.main_window.cam, cam_profile, self.translation)
+                       for cam_profile in self.cam_profiles]
         self.main_window.scene.update_scene()
         self.main_window.cam.set_dirty(True)
         self.main_window.update_widgets()
@@ -228,6 +248,8 @@ class CamMoveCommand(QUndoCommand):
 
         for cam_profile in self.cam_profiles:
             cam_profile.move(-self.translation)
+        self.deltas = [camjournal.profile_move_delta(self.main_window.cam, cam_profile, -self.translation)
+                       for cam_profile in self.cam_profiles]
         self.main_window.scene.update_scene()
         self.main_window.cam.set_dirty(True)
         self.main_window.update_widgets()
@@ -249,16 +271,21 @@ class EditDeleteCommand(QUndoCommand):
         self.cam_profile_list = cam_profile_list
         self.cam_point_list = cam_point_list
         self.text = text
+        self.deltas = []
 
     def redo(self):
         """
         Redo the items delete
         """
 
+        cam = self.main_window.cam
+        self.deltas = []
         for point, cam_profile in self.cam_point_list:
+            self.deltas.append(camjournal.point_delete_delta(cam, cam_profile, point))
             cam_profile.del_point(point)
         for cam_profile in self.cam_profile_list:
-            self.main_window.cam.del_cam(cam_profile)
+            self.deltas.append(camjournal.profile_delete_delta(cam.index(cam_profile)))
+            cam.del_cam(cam_profile)
         self.main_window.scene.update_scene()
         self.main_window.cam.set_dirty(True)
         self.main_window.update_widgets()
@@ -269,10 +296,14 @@ class EditDeleteCommand(QUndoCommand):
         Undo the items delete
         """
 
+        cam = self.main_window.cam
+        self.deltas = []
         for cam_profile in self.cam_profile_list:
-            self.main_window.cam.add_cam(cam_profile)
+            cam.add_cam(cam_profile)
+            self.deltas.append(camjournal.profile_add_delta(cam_profile))
         for point, cam_profile in self.cam_point_list:
             cam_profile.add_point(point)
+            self.deltas.append(camjournal.point_add_delta(cam, cam_profile, point))
         self.main_window.scene.update_scene()
         self.main_window.cam.set_dirty(True)
         self.main_window.update_widgets()
@@ -294,6 +325,7 @@ class PointAddCommand(QUndoCommand):
         self.cam_profile = cam_profile
         self.point = point
         self.text = text
+        self.deltas = []
 
     def redo(self):
         """
@@ -302,6 +334,8 @@ class PointAddCommand(QUndoCommand):
 
         self.cam_profile.add_point(self.point)
         self.cam_profile.check_cam()
+        self.deltas = [camjournal.point_add_delta(self.main_window.cam, self.cam_profile, self.point),
+                       camjournal.check_delta(self.main_window.cam, self.cam_profile)]
         self.main_window.scene.update_scene()
         self.main_window.cam.set_dirty(True)
         self.main_window.update_widgets()
@@ -312,6 +346,8 @@ class PointAddCommand(QUndoCommand):
         Undo: Removes the added point
         """
 
+        self.deltas = [camjournal.point_delete_delta(self.main_window.cam, self.cam_profile, self.point),
+                       camjournal.check_delta(self.main_window.cam, self.cam_profile)]
         self.cam_profile.del_point(self.point)
         self.cam_profile.check_cam()
         self.main_window.scene.updateScene()
@@ -337,14 +373,18 @@ class PointEditCommand(QUndoCommand):
         self.original_cam_point = copy.deepcopy(cam_point)
         self.edited_cam_point = edited_cam_point
         self.text = text
+        self.deltas = []
 
     def redo(self):
         """
         Redo the point editing
         """
 
+        angle = self.cam_point.angle()
         self.cam_profile.edit_point(self.edited_cam_point, self.cam_point)
         self.cam_profile.check_cam()
+        self.deltas = [camjournal.point_set_delta(self.main_window.cam, self.cam_profile, angle, self.cam_point),
+                       camjournal.check_delta(self.main_window.cam, self.cam_profile)]
         self.main_window.scene.update_scene()
         self.main_window.cam.set_dirty(True)
         self.main_window.update_widgets()
@@ -355,8 +395,11 @@ class PointEditCommand(QUndoCommand):
         Undo the point editing
         """
 
+        angle = self.cam_point.angle()
         self.cam_profile.edit_point(self.original_cam_point, self.cam_point)
         self.cam_profile.check_cam()
+        self.deltas = [camjournal.point_set_delta(self.main_window.cam, self.cam_profile, angle, self.cam_point),
+                       camjournal.check_delta(self.main_window.cam, self.cam_profile)]
         self.main_window.scene.update_scene()
         self.main_window.cam.set_dirty(True)
         self.main_window.update_widgets()
@@ -382,6 +425,7 @@ class PointMoveCommand(QUndoCommand):
         self.stop_angle = value.x() / self.scene.angle_steps
         self.stop_displacement = value.y() / self.scene.displacement_steps
         self.done = done
+        self.deltas = []
 
     def id(self):
         """
@@ -398,6 +442,8 @@ class PointMoveCommand(QUndoCommand):
 
         self.stop_angle = command.stop_angle
         self.stop_displacement = command.stop_displacement
+        # the merged command moved the point from the previous stop
+        self.deltas = command.deltas
 
         return True
 
@@ -406,8 +452,11 @@ class PointMoveCommand(QUndoCommand):
         Redo the point editing
         """
 
+        angle = self.cam_point.angle()
         self.cam_point.set_angle(self.stop_angle)
         self.cam_point.set_displacement(self.stop_displacement)
+        self.deltas = [camjournal.point_set_delta(self.scene.parent.cam, self.cam_point.profile(), angle,
+                                                  self.cam_point)]
         self.scene.modified()
 
         if self.done:
@@ -418,8 +467,11 @@ class PointMoveCommand(QUndoCommand):
         Undo the point editing
         """
 
+        angle = self.cam_point.angle()
         self.cam_point.set_angle(self.start_angle)
         self.cam_point.set_displacement(self.start_displacement)
+        self.deltas = [camjournal.point_set_delta(self.scene.parent.cam, self.cam_point.profile(), angle,
+                                                  self.cam_point)]
         self.scene.modified()
         self.scene.update_scene()
         self.done = True
@@ -443,12 +495,14 @@ class PointsMoveCommand(QUndoCommand):
         self.delta_angle = delta_angle
         self.delta_displacement = delta_displacement
         self.text = text
+        self.deltas = []
 
     def redo(self):
         """
         Redo the points editing
         """
 
+        self.deltas = self.move_deltas(self.delta_angle, self.delta_displacement)
         for camPoint in self.pointList:
             camPoint[0].move(self.delta_angle, self.delta_displacement)
         self.mainWindow.scene.update_scene()
@@ -461,8 +515,20 @@ class PointsMoveCommand(QUndoCommand):
         Undo the points editing
         """
 
+        self.deltas = self.move_deltas(-self.delta_angle, -self.delta_displacement)
         for camPoint in self.pointList:
             camPoint[0].move(-self.delta_angle, -self.delta_displacement)
         self.mainWindow.scene.update_scene()
         self.mainWindow.cam.set_dirty(True)
-        self.mainWindow.update_widgets()
\ No newline at end of file
+        self.mainWindow.update_widgets()
+
+    def move_deltas(self, delta_angle, delta_displacement):
+        """
+        Returns the journal deltas of the points moved, a delta for every profile
+        """
+
+        angles = {}
+        for camPoint in self.pointList:
+            angles.setdefault(camPoint[1], []).append(camPoint[0].angle())
+        return [camjournal.points_move_delta(self.mainWindow.cam, cam_profile, profile_angles, delta_angle,
+                                             delta_displacement) for cam_profile, profile_angles in angles.items()]
@@ -11,282 +11,37 @@
 #
 
 import csv
-import ezdxf
 import os
 import pickle
-import sys
+import shutil
 
-from bisect import insort_left
-#from cadquery.vis import show
-from cadquery import Workplane
-from numpy import array, cos, linalg, pi, sin
-from PySide6.QtCore import QLocale, Qt
-from PySide6.QtGui import QColor
+from bisect import bisect_left
+from collections import OrderedDict
+from functools import lru_cache, partial
+from numpy import (arange, argmax, array, clip, column_stack, concatenate, cos, dtype, flatnonzero, float64,
+                   float_power, frombuffer, full, hypot, interp, memmap, pi, searchsorted, sin, uint8, unique, where,
+                   zeros)
 
 MAGIC_NUMBER = 20140112
-FILE_VERSION = 2
+FILE_VERSION = 3
+CXF_VERSION = 3
+
+# version 3 file layout, little endian: header, profiles table, labels, points records of every profile
+HEADER_DTYPE = dtype([("magic", "<u4"), ("version", "<u4"), ("angle_steps", "<u4"), ("displacement_steps", "<u4"),
+                      ("speed", "<f8"), ("radius", "<f8"), ("profiles", "<u8")])
+PROFILE_DTYPE = dtype([("offset", "<u8"), ("points", "<u8"), ("label_offset", "<u8"), ("label_length", "<u8"),
+                       ("color", "S8"), ("height", "<f8"), ("depth", "<f8"), ("min_displacement", "<f8"),
+                       ("max_displacement", "<f8")])
+POINT_DTYPE = dtype([("angle", "<f8"), ("displacement", "<f8"), ("law", "u1")])
 
 # defaults:
 RADIUS = 149.0
 SPEED = 20.0  # round per minute
 angle_steps = 10  # steps per degree
 displacement_steps = 10  # steps per millimeter
-_ACI_ = ((0, 0, 0),
-         (255, 0, 0),
-         (255, 255, 0),
-         (0, 255, 0),
-         (0, 255, 255),
-         (0, 0, 255),
-         (255, 0, 255),
-         (255, 255, 255),
-         (128, 128, 128),
-         (192, 192, 192),
-         (255, 0, 0),
-         (255, 127, 127),
-         (204, 0, 0),
-         (204, 102, 102),
-         (153, 0, 0),
-         (153, 76, 76),
-         (127, 0, 0),
-         (127, 63, 63),
-         (76, 0, 0),
-         (76, 38, 38),
-         (255, 63, 0),
-         (255, 159, 127),
-         (204, 51, 0),
-         (204, 127, 102),
-         (153, 38, 0),
-         (153, 95, 76),
-         (127, 31, 0),
-         (127, 79, 63),
-         (76, 19, 0),
-         (76, 47, 38),
-         (255, 127, 0),
-         (255, 191, 127),
-         (204, 102, 0),
-         (204, 153, 102),
-         (153, 76, 0),
-         (153, 114, 76),
-         (127, 63, 0),
-         (127, 95, 63),
-         (76, 38, 0),
-         (76, 57, 38),
-         (255, 191, 0),
-         (255, 223, 127),
-         (204, 153, 0),
-         (204, 178, 102),
-         (153, 114, 0),
-         (153, 133, 76),
-         (127, 95, 0),
-         (127, 111, 63),
-         (76, 57, 0),
-         (76, 66, 38),
-         (255, 255, 0),
-         (255, 255, 127),
-         (204, 204, 0),
-         (204, 204, 102),
-         (152, 152, 0),
-         (152, 152, 76),
-         (127, 127, 0),
-         (127, 127, 63),
-         (76, 76, 0),
-         (76, 76, 38),
-         (191, 255, 0),
-         (223, 255, 127),
-         (153, 204, 0),
-         (178, 204, 102),
-         (114, 152, 0),
-         (133, 152, 76),
-         (95, 127, 0),
-         (111, 127, 63),
-         (57, 76, 0),
-         (66, 76, 38),
-         (127, 255, 0),
-         (191, 255, 127),
-         (102, 204, 0),
-         (153, 204, 102),
-         (76, 152, 0),
-         (114, 152, 76),
-         (63, 127, 0),
-         (95, 127, 63),
-         (38, 76, 0),
-         (57, 76, 38),
-         (63, 255, 0),
-         (159, 255, 127),
-         (51, 204, 0),
-         (127, 204, 102),
-         (38, 152, 0),
-         (95, 152, 76),
-         (31, 127, 0),
-         (79, 127, 63),
-         (19, 76, 0),
-         (47, 76, 38),
-         (0, 255, 0),
-         (127, 255, 127),
-         (0, 204, 0),
-         (102, 204, 102),
-         (0, 152, 0),
-         (76, 152, 76),
-         (0, 127, 0),
-         (63, 127, 63),
-         (0, 76, 0),
-         (38, 76, 38),
-         (0, 255, 63),
-         (127, 255, 159),
-         (0, 204, 51),
-         (102, 204, 127),
-         (0, 152, 38),
-         (76, 152, 95),
-         (0, 127, 31),
-         (63, 127, 79),
-         (0, 76, 19),
-         (38, 76, 47),
-         (0, 255, 127),
-         (127, 255, 191),
-         (0, 204, 102),
-         (102, 204, 153),
-         (0, 152, 76),
-         (76, 152, 114),
-         (0, 127, 63),
-         (63, 127, 95),
-         (0, 76, 38),
-         (38, 76, 57),
-         (0, 255, 191),
-         (127, 255, 223),
-         (0, 204, 153),
-         (102, 204, 178),
-         (0, 152, 114),
-         (76, 152, 133),
-         (0, 127, 95),
-         (63, 127, 111),
-         (0, 76, 57),
-         (38, 76, 66),
-         (0, 255, 255),
-         (127, 255, 255),
-         (0, 204, 204),
-         (102, 204, 204),
-         (0, 152, 152),
-         (76, 152, 152),
-         (0, 127, 127),
-         (63, 127, 127),
-         (0, 76, 76),
-         (38, 76, 76),
-         (0, 191, 255),
-         (127, 223, 255),
-         (0, 153, 204),
-         (102, 178, 204),
-         (0, 114, 152),
-         (76, 133, 152),
-         (0, 95, 127),
-         (63, 111, 127),
-         (0, 57, 76),
-         (38, 66, 76),
-         (0, 127, 255),
-         (127, 191, 255),
-         (0, 102, 204),
-         (102, 153, 204),
-         (0, 76, 152),
-         (76, 114, 152),
-         (0, 63, 127),
-         (63, 95, 127),
-         (0, 38, 76),
-         (38, 57, 76),
-         (0, 63, 255),
-         (127, 159, 255),
-         (0, 51, 204),
-         (102, 127, 204),
-         (0, 38, 152),
-         (76, 95, 152),
-         (0, 31, 127),
-         (63, 79, 127),
-         (0, 19, 76),
-         (38, 47, 76),
-         (0, 0, 255),
-         (127, 127, 255),
-         (0, 0, 204),
-         (102, 102, 204),
-         (0, 0, 152),
-         (76, 76, 152),
-         (0, 0, 127),
-         (63, 63, 127),
-         (0, 0, 76),
-         (38, 38, 76),
-         (63, 0, 255),
-         (159, 127, 255),
-         (51, 0, 204),
-         (127, 102, 204),
-         (38, 0, 152),
-         (95, 76, 152),
-         (31, 0, 127),
-         (79, 63, 127),
-         (19, 0, 76),
-         (47, 38, 76),
-         (127, 0, 255),
-         (191, 127, 255),
-         (102, 0, 204),
-         (153, 102, 204),
-         (76, 0, 152),
-         (114, 76, 152),
-         (63, 0, 127),
-         (95, 63, 127),
-         (38, 0, 76),
-         (57, 38, 76),
-         (191, 0, 255),
-         (223, 127, 255),
-         (153, 0, 204),
-         (178, 102, 204),
-         (114, 0, 152),
-         (133, 76, 152),
-         (95, 0, 127),
-         (111, 63, 127),
-         (57, 0, 76),
-         (66, 38, 76),
-         (255, 0, 255),
-         (255, 127, 255),
-         (204, 0, 204),
-         (204, 102, 204),
-         (152, 0, 152),
-         (152, 76, 152),
-         (127, 0, 127),
-         (127, 63, 127),
-         (76, 0, 76),
-         (76, 38, 76),
-         (255, 0, 191),
-         (255, 127, 223),
-         (204, 0, 153),
-         (204, 102, 178),
-         (152, 0, 114),
-         (152, 76, 133),
-         (127, 0, 95),
-         (127, 63, 111),
-         (76, 0, 57),
-         (76, 38, 66),
-         (255, 0, 127),
-         (255, 127, 191),
-         (204, 0, 102),
-         (204, 102, 153),
-         (152, 0, 76),
-         (152, 76, 114),
-         (127, 0, 63),
-         (127, 63, 95),
-         (76, 0, 38),
-         (76, 38, 57),
-         (255, 0, 63),
-         (255, 127, 159),
-         (204, 0, 51),
-         (204, 102, 127),
-         (152, 0, 38),
-         (152, 76, 95),
-         (127, 0, 31),
-         (127, 63, 79),
-         (76, 0, 19),
-         (76, 38, 47),
-         (51, 51, 51),
-         (91, 91, 91),
-         (132, 132, 132),
-         (173, 173, 173),
-         (214, 214, 214),
-         (255, 255, 255))
+csv_chunk_rows = 65536  # rows formatted at a time by save_2D_CSV
+law_params_cache_size = 4096  # cached law segments
+sample_cache_size = 8  # cached polylines per profile
 
 
 class CamPoint(object):
@@ -303,6 +58,8 @@ class CamPoint(object):
     _LAW_CUBIC = 3  # Not yet implemented
     _LAWS = (_LAW_LINEAR, _LAW_SINUSOIDAL, _LAW_PARABOLIC)
 
+    __slots__ = ("__angle", "__displacement", "__law", "__profile")
+
     def __init__(self, angle, displacement=0.0, law=_LAW_LINEAR):
         """
         Constructor
@@ -311,6 +68,27 @@ class CamPoint(object):
         self.__angle = angle
         self.__displacement = displacement
         self.__law = law
+        self.__profile = None
+
+    def __getstate__(self):
+        """
+        Returns the point state without the link to the profile, as the dictionary saved
+        by the versions without slots
+        """
+
+        return {"_CamPoint__angle": self.__angle,
+                "_CamPoint__displacement": self.__displacement,
+                "_CamPoint__law": self.__law}
+
+    def __setstate__(self, state):
+        """
+        Restores the point state
+        """
+
+        self.__angle = state["_CamPoint__angle"]
+        self.__displacement = state["_CamPoint__displacement"]
+        self.__law = state["_CamPoint__law"]
+        self.__profile = None
 
     def __iadd__(self, other):
         """
@@ -363,13 +141,23 @@ class CamPoint(object):
 
         return ["Linear", "Sinusoidal", "Parabolic"][self.__law]
 
+    def profile(self):
+        """
+        Returns the profile the point belongs to, None if it is not in a profile
+        """
+
+        return self.__profile
+
     def set_angle(self, angle):
         """
         Sets the point angle to the nearest angle
         """
 
         if 0 < angle <= 360:
-            self.__angle = int(angle * angle_steps) / angle_steps
+            angle = int(angle * angle_steps) / angle_steps
+            if angle != self.__angle:
+                self.__angle = angle
+                self.__changed()
         else:
             raise ValueError("The angle must be greater than 0 and equal or less than 360")
 
@@ -379,7 +167,9 @@ class CamPoint(object):
         """
 
         if displacement >= 0:
-            self.__displacement = displacement
+            if displacement != self.__displacement:
+                self.__displacement = displacement
+                self.__changed()
         else:
             raise ValueError("The displacement must be equal or greater than 0")
 
@@ -388,10 +178,27 @@ class CamPoint(object):
         Sets the point law
         """
         if law in CamPoint._LAWS:
-            self.__law = law
+            if law != self.__law:
+                self.__law = law
+                self.__changed()
         else:
             raise ValueError("Law {0} not implemented".format(law))
 
+    def set_profile(self, profile):
+        """
+        Sets the profile to notify when the point changes
+        """
+
+        self.__profile = profile
+
+    def __changed(self):
+        """
+        Invalidates the samples of the profile
+        """
+
+        if self.__profile is not None:
+            self.__profile.invalidate()
+
 
 class CamProfile(object):
     """
@@ -399,7 +206,7 @@ class CamProfile(object):
     Keeps a list of cam points
     """
 
-    def __init__(self, points=None, label=None, color=Qt.black):
+    def __init__(self, points=None, label=None, color="#000000"):
         """
         Creates the points list
         """
@@ -411,9 +218,43 @@ class CamProfile(object):
             self.__points.append(CamPoint(360))
         if label is not None:
             self.__label = label
-        self.__color = color
+        self.__color = color_name(color)
         self.__height = 35.5
         self.__depth = 16.5
+        self.__init_samples()
+
+    def __getstate__(self):
+        """
+        Returns the profile state without the samples cache
+        """
+
+        self.load_points()
+        state = self.__dict__.copy()
+        for key in ("_CamProfile__samples", "_CamProfile__blocks", "_CamProfile__version", "_CamProfile__hits",
+                    "_CamProfile__misses", "_CamProfile__limits"):
+            state.pop(key, None)
+        return state
+
+    def __setstate__(self, state):
+        """
+        Restores the profile state and links the points to the profile
+        """
+
+        self.__dict__.update(state)
+        self.__color = color_name(self.__color)
+        self.__init_samples()
+
+    def __getattr__(self, name):
+        """
+        Reads the points of a lazy profile the first time they are needed
+        """
+
+        if name == "_CamProfile__points" and "_CamProfile__loader" in self.__dict__:
+            self.__points = self.__dict__.pop("_CamProfile__loader")()
+            for point in self.__points:
+                point.set_profile(self)
+            return self.__points
+        raise AttributeError(name)
 
     def __iter__(self):
         """
@@ -443,12 +284,16 @@ class CamProfile(object):
         Returns True if the angle already exists False otherwise
         """
 
-        for i, p in enumerate(self.__points):
-            if p.angle() == point.angle():
-                self.__points[i] = point
-                return True
+        point.set_profile(self)
+        self.invalidate()
+        i = bisect_left(self.__points, point.angle(), key=CamPoint.angle)
+        if i < len(self.__points) and self.__points[i].angle() == point.angle():
+            if self.__points[i].profile() is self:
+                self.__points[i].set_profile(None)
+            self.__points[i] = point
+            return True
         else:
-            insort_left(self.__points, point)
+            self.__points.insert(i, point)
             return False
 
     def check_cam(self):
@@ -456,22 +301,17 @@ class CamProfile(object):
         Checks the cam for errors and corrects them
         """
 
-        for point in self.__points:
-            prev_point = self.get_prev_point(point)
-            if prev_point is not None:
-                if point.displacement() == prev_point.displacement():
-                    point.set_law(CamPoint._LAW_LINEAR)
-                if point.displacement() != prev_point.displacement() and point.law() == CamPoint._LAW_LINEAR:
-                    point.set_law(CamPoint._LAW_SINUSOIDAL)
-            else:
-                if point.displacement() == self.__points[-1].displacement():
-                    point.set_law(CamPoint._LAW_LINEAR)
-                if point.displacement() != self.__points[-1].displacement() and point.law() == CamPoint._LAW_LINEAR:
-                    point.set_law(CamPoint._LAW_SINUSOIDAL)
+        # the first point starts from the displacement of the last one
+        for i, point in enumerate(self.__points):
+            prev_displacement = self.__points[i - 1].displacement()
+            if point.displacement() == prev_displacement:
+                point.set_law(CamPoint._LAW_LINEAR)
+            if point.displacement() != prev_displacement and point.law() == CamPoint._LAW_LINEAR:
+                point.set_law(CamPoint._LAW_SINUSOIDAL)
 
     def color(self):
         """
-        Returns the cam color
+        Returns the cam color as a "#rrggbb" string
         """
 
         return self.__color
@@ -482,6 +322,9 @@ class CamProfile(object):
         """
 
         self.__points.remove(point)
+        if point.profile() is self:
+            point.set_profile(None)
+        self.invalidate()
 
     def depth(self):
         """
@@ -552,16 +395,11 @@ class CamProfile(object):
         Raises keyError if the point is not in the profile
         """
 
-        if point not in self:
-            raise KeyError("This point is not in the profile")
+        i = self.index(point)
+        if i == len(self.__points) - 1:
+            return None
         else:
-            if point == self.__points[-1]:
-                return None
-            else:
-                for i, p in enumerate(self):
-                    if p == point:
-                        break
-                return self[i + 1]
+            return self.__points[i + 1]
 
     def get_prev_point(self, point):
         """
@@ -569,16 +407,11 @@ class CamProfile(object):
         Raises keyError if the point is not in the profile
         """
 
-        if point not in self:
-            raise KeyError("This point is not in the profile")
+        i = self.index(point)
+        if i == 0:
+            return None
         else:
-            for i, p in enumerate(self):
-                if p == point:
-                    break
-            if i == 0:
-                return None
-            else:
-                return self[i - 1]
+            return self.__points[i - 1]
 
     def height(self):
         """
@@ -587,6 +420,49 @@ class CamProfile(object):
 
         return self.__height
 
+    def index(self, point):
+        """
+        Returns the position of point in the profile, searching its angle in the sorted points
+        Raises keyError if the point is not in the profile
+        """
+
+        i = bisect_left(self.__points, point.angle(), key=CamPoint.angle)
+        if i < len(self.__points) and self.__points[i] is point:
+            return i
+        # an edited angle can leave the points out of order, sort them and search again
+        if any(self.__points[j + 1] < self.__points[j] for j in range(len(self.__points) - 1)):
+            self.__points.sort()
+            self.invalidate()
+            i = bisect_left(self.__points, point.angle(), key=CamPoint.angle)
+            if i < len(self.__points) and self.__points[i] is point:
+                return i
+        raise KeyError("This point is not in the profile")
+
+    def invalidate(self):
+        """
+        Discards the cached samples, called every time the profile or one of its points changes
+        """
+
+        self.__version += 1
+        self.__samples.clear()
+
+    def kinematics(self, angle_steps=angle_steps):
+        """
+        Returns a (4, N) array with the angles, the displacements, the first and the second derivatives
+        evaluated in a single pass on the same grid of polyline_array(True)
+        """
+
+        self.check_cam()
+        blocks = []
+        prev_point = CamPoint(0, self.__points[-1].displacement())
+        for point in self.__points:
+            blocks.append(self.segment_kinematics(point, prev_point, point is self.__points[-1], angle_steps))
+            prev_point = point
+        kinematics = concatenate(blocks, axis=1)
+        kinematics[1, -1] = self.__points[-1].displacement()
+
+        return kinematics
+
     def label(self):
         """
         Returns the cam label
@@ -594,11 +470,28 @@ class CamProfile(object):
 
         return self.__label
 
+    def load_points(self):
+        """
+        Reads the points of a lazy profile if they are not read yet
+        """
+
+        if not self.loaded():
+            self.__getattr__("_CamProfile__points")
+
+    def loaded(self):
+        """
+        Returns False until the points of a lazy profile are read
+        """
+
+        return "_CamProfile__loader" not in self.__dict__
+
     def max_displacement(self):
         """
         Returns the max displacement
         """
 
+        if not self.loaded():
+            return self.__limits[1]
         return max(self.displacements())
 
     def min_displacement(self):
@@ -606,6 +499,8 @@ class CamProfile(object):
         Returns the max displacement
         """
 
+        if not self.loaded():
+            return self.__limits[0]
         return min(self.displacements())
 
     def mirror(self):
@@ -621,6 +516,11 @@ class CamProfile(object):
                                               old_points[i].displacement(),
                                               old_points[i + 1].law()))
             self.__points.append(CamPoint(360, old_points[-1].displacement(), old_points[0].law()))
+            for point in old_points:
+                point.set_profile(None)
+            for point in self.__points:
+                point.set_profile(self)
+            self.invalidate()
 
     def move(self, translation):
         """
@@ -664,24 +564,56 @@ class CamProfile(object):
 
         return polyline
 
+    def polyline_array(self, complete, angle_steps=angle_steps):
+        """
+        Returns the polyline points as a contiguous, read only, (N, 2) float64 array
+
+        complete is a boolean parameter, if false the polyline includes only first and last of aligned points
+        The samples are the same returned by polyline, but every law segment is evaluated with a single
+        array expression, the result is cached until the profile changes.
+        The samples of every segment are kept too, so when a point changes only the segments touching it
+        are evaluated again
+        """
+
+        key = (complete, angle_steps)
+        polyline = self.__samples.get(key)
+        if polyline is not None:
+            self.__samples.move_to_end(key)
+            self.__hits += 1
+            return polyline
+
+        self.__misses += 1
+        self.check_cam()
+        old_blocks = self.__blocks.get(key, {})
+        blocks = {}
+        prev_point = CamPoint(0, self.__points[-1].displacement())
+        for point in self.__points:
+            segment = (prev_point.angle(), prev_point.displacement(), point.angle(), point.displacement(),
+                       point.law())
+            block = old_blocks.get(segment)
+            if block is None:
+                block = self.segment_array(point, prev_point, complete, angle_steps)
+            blocks[segment] = block
+            prev_point = point
+        polyline = concatenate(list(blocks.values()) +
+                               [array([[360.0, self.__points[-1].displacement()]], dtype=float64)])
+        polyline.flags.writeable = False
+
+        self.__blocks[key] = blocks
+        self.__samples[key] = polyline
+        if len(self.__samples) > sample_cache_size:
+            old_key, _ = self.__samples.popitem(last=False)
+            self.__blocks.pop(old_key, None)
+        return polyline
+
     def quadratic_params(self, point, prev_point):
         """
         Finds the parameters of the quadratic functions that have the
         max and min in point and prevPoint
         """
 
-        mid_angle = (prev_point.angle() + point.angle()) / 2
-        mid_displacement = (prev_point.displacement() + point.displacement()) / 2
-        a = array([[prev_point.angle() ** 2, prev_point.angle(), 1, 0, 0, 0],
-                   [2 * prev_point.angle(), 1, 0, 0, 0, 0],
-                   [mid_angle ** 2, mid_angle, 1, 0, 0, 0],
-                   [0, 0, 0, mid_angle ** 2, mid_angle, 1],
-                   [0, 0, 0, point.angle() ** 2, point.angle(), 1],
-                   [0, 0, 0, 2 * point.angle(), 1, 0]])
-        b = array([[prev_point.displacement()], [0], [mid_displacement], [mid_displacement],
-                   [point.displacement()], [0]])
-        x = linalg.solve(a, b)
-        return x[:, 0]
+        return law_params(CamPoint._LAW_PARABOLIC, prev_point.angle(), prev_point.displacement(),
+                          point.angle(), point.displacement())
 
     def second_derivative(self, angle_steps=angle_steps):
         """
@@ -717,12 +649,68 @@ class CamProfile(object):
             prev_point = point
         return second_derivative
 
+    def sample_cache_info(self):
+        """
+        Returns the hits, the misses and the current size of the samples cache
+        """
+
+        return self.__hits, self.__misses, len(self.__samples)
+
+    def segment_array(self, point, prev_point, complete, angle_steps=angle_steps):
+        """
+        Returns the (N, 2) array of the samples between prev_point (included) and point (excluded)
+        """
+
+        start = int(prev_point.angle() * angle_steps)
+        stop = int(point.angle() * angle_steps)
+        if point.law() == CamPoint._LAW_LINEAR:
+            if not complete:
+                return array([[prev_point.angle(), prev_point.displacement()]], dtype=float64)
+            x = arange(start, stop) / angle_steps
+            return column_stack((x, full(len(x), point.displacement(), dtype=float64)))
+        elif point.law() == CamPoint._LAW_SINUSOIDAL:
+            a, b, c, d = self.sine_params(point, prev_point)
+            x = arange(start, stop) / angle_steps
+            return column_stack((x, c * sin((a * x + b) * (pi / 180)) + d))
+        elif point.law() == CamPoint._LAW_PARABOLIC:
+            a1, b1, c1, a2, b2, c2 = self.quadratic_params(point, prev_point)
+            middle = int(((prev_point.angle() + point.angle()) / 2) * angle_steps)
+            x1 = arange(start, middle) / angle_steps
+            x2 = arange(middle, stop) / angle_steps
+            return concatenate((column_stack((x1, a1 * float_power(x1, 2) + b1 * x1 + c1)),
+                                column_stack((x2, a2 * float_power(x2, 2) + b2 * x2 + c2))))
+        return array([], dtype=float64).reshape(0, 2)
+
+    def segment_kinematics(self, point, prev_point, last, angle_steps=angle_steps):
+        """
+        Returns the (4, N) array of angles, displacements, first and second derivatives between
+        prev_point (included) and point (included only if last is True)
+        """
+
+        start = int(prev_point.angle() * angle_steps)
+        stop = int(point.angle() * angle_steps) + (1 if last else 0)
+        x = arange(start, stop) / angle_steps
+        if point.law() == CamPoint._LAW_SINUSOIDAL:
+            a, b, c, d = self.sine_params(point, prev_point)
+            t = (a * x + b) * (pi / 180)
+            return array((x, c * sin(t) + d, c * cos(t) * a, c * sin(t) * (a ** 2)))
+        elif point.law() == CamPoint._LAW_PARABOLIC:
+            a1, b1, c1, a2, b2, c2 = self.quadratic_params(point, prev_point)
+            middle = int(((prev_point.angle() + point.angle()) / 2) * angle_steps)
+            x1 = arange(start, middle) / angle_steps
+            x2 = arange(middle, stop) / angle_steps
+            return concatenate((array((x1, a1 * float_power(x1, 2) + b1 * x1 + c1, (2 * a1 * x1 + b1) / (pi / 180),
+                                       full(len(x1), (2 * a1) / (pi / 180) ** 2))),
+                                array((x2, a2 * float_power(x2, 2) + b2 * x2 + c2, (2 * a2 * x2 + b2) / (pi / 180),
+                                       full(len(x2), (2 * a2) / (pi / 180) ** 2)))), axis=1)
+        return array((x, full(len(x), point.displacement()), zeros(len(x)), zeros(len(x))))
+
     def set_color(self, color):
         """
         Sets the cam color
         """
 
-        self.__color = color
+        self.__color = color_name(color)
 
     def set_depth(self, depth):
         """Setter for self.__depth.
@@ -736,6 +724,19 @@ class CamProfile(object):
 
         self.__height = height
 
+    def set_loader(self, loader, min_displacement, max_displacement):
+        """
+        Makes the profile lazy, its points are returned by loader the first time they are needed
+        and min_displacement and max_displacement are used until then
+        """
+
+        for point in self.__dict__.pop("_CamProfile__points", []):
+            if point.profile() is self:
+                point.set_profile(None)
+        self.__loader = loader
+        self.__limits = (min_displacement, max_displacement)
+        self.invalidate()
+
     def set_label(self, label):
         """
         Sets the cam label
@@ -749,13 +750,28 @@ class CamProfile(object):
         max and min in point and prevPoint
         """
 
-        a = array([[prev_point.angle(), 1, 0, 0],
-                   [point.angle(), 1, 0, 0],
-                   [0, 0, -1, 1],
-                   [0, 0, 1, 1]])
-        b = array([[-90], [90], [prev_point.displacement()], [point.displacement()]])
-        x = linalg.solve(a, b)
-        return x[:, 0]
+        return law_params(CamPoint._LAW_SINUSOIDAL, prev_point.angle(), prev_point.displacement(),
+                          point.angle(), point.displacement())
+
+    def version(self):
+        """
+        Returns the profile version, incremented every time the samples are invalidated
+        """
+
+        return self.__version
+
+    def __init_samples(self):
+        """
+        Creates the empty samples cache and links the points to the profile
+        """
+
+        self.__samples = OrderedDict()
+        self.__blocks = {}
+        self.__version = 0
+        self.__hits = 0
+        self.__misses = 0
+        for point in self.__dict__.get("_CamProfile__points", []):
+            point.set_profile(self)
 
 
 class Cam(object):
@@ -839,6 +855,25 @@ class Cam(object):
 
         return self.__angle_steps
 
+    def decimated_polylines(self, tolerance, angle_steps=None):
+        """
+        Returns the complete polylines of the profiles decimated with the chordal tolerance in millimetres
+        on the cam cylinder, the number of samples before the decimation and the maximum deviation
+        """
+
+        if angle_steps is None:
+            angle_steps = self.__angle_steps
+        polylines = []
+        samples = 0
+        deviation = 0.0
+        for cam_profile in self.__cams:
+            polyline = cam_profile.polyline_array(True, angle_steps)
+            indexes, profile_deviation = decimate(polyline, self.__radius, tolerance)
+            polylines.append(polyline[indexes])
+            samples += len(polyline)
+            deviation = max(deviation, profile_deviation)
+        return polylines, samples, deviation
+
     def del_cam(self, cam):
         """
         Removes the specified cam
@@ -874,11 +909,19 @@ class Cam(object):
 
         return self.__file_name
 
-    def load(self, file_name=""):
+    def index(self, cam):
+        """
+        Returns the position of the cam profile
+        """
+
+        return self.__cams.index(cam)
+
+    def load(self, file_name="", lazy=False):
         """Load a file.
 
         Parameters:
         file_name (str): the full name of the file
+        lazy (bool): read only the header of a version 3 file, the points of each profile are read at the first use
 
         Return:
         bool: a boolean to represent if the load was successful
@@ -889,11 +932,15 @@ class Cam(object):
             self.__file_name = file_name
 
         with open(self.__file_name, 'rb') as fh:
+            # the pickled files start with the protocol opcode, the version 3 files with the magic number
+            if fh.read(1) != pickle.PROTO:
+                return self.__load_records(lazy)
+            fh.seek(0)
             magic = pickle.load(fh)
             if magic != MAGIC_NUMBER:
                 raise IOError("unrecognized file type")
             version = pickle.load(fh)
-            if version == FILE_VERSION:
+            if version == 2:
                 self.__angle_steps = pickle.load(fh)
                 self.__displacement_steps = pickle.load(fh)
                 self.__speed = pickle.load(fh)
@@ -923,7 +970,7 @@ class Cam(object):
             if magic != MAGIC_NUMBER:
                 raise IOError("unrecognized file type")
             version = pickle.load(fh)
-            if version == FILE_VERSION:
+            if version in (2, CXF_VERSION):
                 self.__angle_steps = pickle.load(fh)
                 self.__displacement_steps = pickle.load(fh)
                 self.__speed = pickle.load(fh)
@@ -934,12 +981,21 @@ class Cam(object):
                     color = pickle.load(fh)
                     height = pickle.load(fh)
                     depth = pickle.load(fh)
-                    cam_data = pickle.load(fh)
-                    points = []
-                    while cam_data != "</cam_profile>":
-                        points.append(CamPoint(cam_data[0], cam_data[1], cam_data[2]))
+                    if version == CXF_VERSION:
+                        # the points are a block of records prefixed by its size in bytes
+                        size = int.from_bytes(fh.read(8), "little")
+                        block = fh.read(size)
+                        if len(block) != size:
+                            raise IOError("truncated file")
+                        points = points_from_records(frombuffer(block, dtype=POINT_DTYPE))
                         cam_data = pickle.load(fh)
-                    cam_profile = CamProfile(points, label, QColor(color))
+                    else:
+                        cam_data = pickle.load(fh)
+                        points = []
+                        while cam_data != "</cam_profile>":
+                            points.append(CamPoint(cam_data[0], cam_data[1], cam_data[2]))
+                            cam_data = pickle.load(fh)
+                    cam_profile = CamProfile(points, label, color)
                     cam_profile.set_height(height)
                     cam_profile.set_depth(depth)
                     self.__cams.append(cam_profile)
@@ -980,28 +1036,20 @@ class Cam(object):
 
     def save(self):
         """
-        Saves the Cam Data to file_name
+        Saves the Cam Data to file_name in the version 3 binary format
         """
 
-        with open(self.file_name(), 'wb') as fh:
-            pickle.dump(MAGIC_NUMBER, fh)
-            pickle.dump(FILE_VERSION, fh)
-            pickle.dump(self.angle_steps(), fh)
-            pickle.dump(self.displacement_steps(), fh)
-            pickle.dump(self.__speed, fh)
-            pickle.dump(self.__radius, fh)
-            pickle.dump(self.__cams, fh)
-
+        write_file(self.file_name(), self.snapshot())
         self.__dirty = False
 
     def save_cxf(self, file_name):
         """
-        Exports the Cam Data to filename in cxf format
+        Exports the Cam Data to filename in cxf format, the points of every profile in a single block
         """
 
         with open(file_name, 'wb') as fh:
             pickle.dump(MAGIC_NUMBER, fh)
-            pickle.dump(FILE_VERSION, fh)
+            pickle.dump(CXF_VERSION, fh)
             pickle.dump(self.angle_steps(), fh)
             pickle.dump(self.displacement_steps(), fh)
             pickle.dump(self.__speed, fh)
@@ -1010,86 +1058,103 @@ class Cam(object):
             for cam in self.__cams:
                 pickle.dump("<cam_profile>", fh)
                 pickle.dump(cam.label(), fh)
-                pickle.dump(cam.color().name(QColor.HexRgb), fh)
+                pickle.dump(cam.color(), fh)
                 pickle.dump(cam.height(), fh)
                 pickle.dump(cam.depth(), fh)
-                for point in cam:
-                    pickle.dump([point.angle(), point.displacement(), point.law()], fh)
+                block = points_to_records(cam).tobytes()
+                fh.write(len(block).to_bytes(8, "little"))
+                fh.write(block)
                 pickle.dump("</cam_profile>", fh)
             pickle.dump("</cam>", fh)
 
-    def save_2D_CSV(self, filename):
+    def save_2D_CSV(self, filename, decimal_point=".", layout="long", angle_steps=None, tolerance=None):
         """
-        Exports the Cam Data to filename in CSV format
+        Exports the Cam Data to filename in CSV format, using decimal_point as decimal separator
+        and sampling angle_steps steps per degree, the cam angle steps if None
+
+        The long layout writes the angle and displacement rows of every profile one after the other,
+        the wide layout writes a header with the labels and a row for every angle step with the
+        displacements of all the profiles side by side.
+        With a tolerance the polylines are decimated, the wide layout keeps the angles kept in any profile.
+        The samples are formatted csv_chunk_rows rows at a time
         """
 
+        if angle_steps is None:
+            angle_steps = self.__angle_steps
+        message = "Cam saved to {0}".format(os.path.basename(filename))
+        if layout == "long":
+            if tolerance is None:
+                tables = [cam_profile.polyline_array(False, angle_steps) for cam_profile in self.__cams]
+            else:
+                tables, samples, deviation = self.decimated_polylines(tolerance, angle_steps)
+                vertices = sum(len(table) for table in tables)
+        elif layout == "wide":
+            if tolerance is None:
+                angles = arange(0, 360 * angle_steps + 1) / angle_steps
+            else:
+                polylines, samples, _ = self.decimated_polylines(tolerance, angle_steps)
+                angles = unique(concatenate([polyline[:, 0] for polyline in polylines]))
+                vertices = len(angles) * len(self.__cams)
+                deviation = 0.0
+            columns = [angles]
+            for cam_profile in self.__cams:
+                polyline = cam_profile.polyline_array(True, angle_steps)
+                columns.append(interp(angles, polyline[:, 0], polyline[:, 1]))
+                if tolerance is not None:
+                    # the rows kept for the other profiles change the chords of every profile
+                    indexes = searchsorted(polyline[:, 0], angles)
+                    deviation = max(deviation, chord_deviation(polyline, self.__radius, indexes))
+            tables = [column_stack(columns)]
+        else:
+            raise ValueError("unknown CSV layout {0}".format(layout))
+        if tolerance is not None:
+            message += ", {0} vertices reduced to {1}, max deviation {2:.4f} mm".format(samples, vertices, deviation)
+
         with open(filename, 'w', newline='') as csvfile:
-            for camProfile in self.__cams:
+            if layout == "wide":
                 writer = csv.writer(csvfile, delimiter=';', quotechar='|', quoting=csv.QUOTE_MINIMAL)
-                points = camProfile.polyline(False)
-                for point in points:
-                    #writer.writerow([point[0], point[1]])
-                    angle = '{0:.3f}'.format(point[0]).replace('.', QLocale.system().decimalPoint())
-                    displacement = '{0:.3f}'.format(point[1]).replace('.', QLocale.system().decimalPoint())
-                    writer.writerow([angle, displacement])
+                writer.writerow(["Angle"] + [cam_profile.label() for cam_profile in self.__cams])
+            for table in tables:
+                row_format = ";".join(["%.3f"] * table.shape[1]) + "\r\n"
+                for start in range(0, len(table), csv_chunk_rows):
+                    chunk = table[start:start + csv_chunk_rows]
+                    text = (row_format * len(chunk)) % tuple(chunk.ravel().tolist())
+                    csvfile.write(text.replace('.', decimal_point) if decimal_point != '.' else text)
+        return True, message
 
-    def save_2D_DXF(self, file_name):
+    def save_2D_DXF(self, file_name, tolerance=None, splines=False, dxf_version=None):
         """
-        Exports the Cam Data to file_name
+        Exports the Cam Data to file_name, with a tolerance the polylines are decimated,
+        with splines the law segments are splines fitted within the tolerance.
+        dxf_version is the AutoCAD version of the file, AC1015 if None
         """
 
-        polylines = []
-        ezdxf.options.template_dir = 'templates'
-        drawing = ezdxf.new('AC1015')
-        model_space = drawing.modelspace()
-        for i, cam_profile in enumerate(self.__cams):
-            drawing.layers.add(name=cam_profile.label())
-            layer = drawing.layers.get(cam_profile.label())
-            layer.set_color(qColor_to_ACI(cam_profile.color()))
-            polylines.append([])
-            points = cam_profile.polyline(True)
-            for point in points:
-                polylines[i].append((-2 * pi * self.__radius * point[0] / 360, point[1]))
-            model_space.add_lwpolyline(polylines[i])
-            polyline = model_space.query('LWPOLYLINE')[i]
-            polyline.dxf.layer = cam_profile.label()
-        drawing.saveas(file_name)
-        return True, "Cam saved to {0}".format(os.path.basename(file_name))
-
-    def save_3D_STP(self, file_name, angle_pitch):
-        """
-        Exports the Cam Data to file_name in STEP format
-        """
-
-        results = []
-        angle_pitch *= 10
-        for i, cam_profile in enumerate(self.__cams):
-            polyline = []
-            aux = []
-            points = cam_profile.polyline(True)
-
-            height = cam_profile.height()
-            depth = cam_profile.depth()
-
-            for j in range(0, len(points), angle_pitch):
-                polyline.append((self.__radius * cos(points[j][0] * (pi / 180)),
-                                self.__radius * sin(points[j][0] * (pi / 180)), -points[j][1]))
-                aux.append(((self.__radius - depth) * cos(points[j][0] * (pi / 180)),
-                            (self.__radius - depth) * sin(points[j][0] * (pi / 180)), -points[j][1]))
-
-            section = Workplane("XZ").move(self.radius() - depth/2, -points[0][1]).rect(depth, height)
-            path = Workplane("XY").spline(polyline)
-            aux_spine = Workplane("XY").spline(aux)
-
-            results.append(section.sweep(path, auxSpine=aux_spine))
-
-        result = results[0]
-        for i in range(1, len(results)):
-            result = result.union(results[i])
-
-        #show([result, path, aux_spine, section])
-        result.val().exportStep(file_name)
-        return True, "Cam saved to {0}".format(os.path.basename(file_name))
+        from BarrelCam import camdxf
+        return camdxf.save_2D_DXF(self, file_name, tolerance, splines, dxf_version or camdxf.DXF_VERSION)
+
+    def save_3D_STP(self, file_name, angle_pitch, jobs=None, tolerance=None, cache=None, drum_length=None, bore=None,
+                    mp_context=None):
+        """
+        Exports the Cam Data to file_name in STEP format, sweeping the profiles in jobs processes
+        started with mp_context,
+        with a tolerance the spine points are chosen to keep the groove within the tolerance,
+        with a camcache.SolidCache the solids swept before are read from the cache,
+        with a drum_length the grooves and the bore are cut from the drum of the cam radius
+        """
+
+        from BarrelCam import camstep
+        return camstep.save_3D_STP(self, file_name, angle_pitch, jobs, tolerance, cache, drum_length, bore,
+                                   mp_context)
+
+    def save_3D_STL(self, file_name, tolerance=None, drum_length=None, bore=None):
+        """
+        Exports the drum of the Cam Data with the grooves cut to file_name in binary STL format,
+        drum_length long, or below the deepest groove if None, with a bore of diameter bore if not None,
+        with a tolerance the sections are decimated
+        """
+
+        from BarrelCam import camstl
+        return camstl.save_3D_STL(self, file_name, tolerance, drum_length, bore)
 
     def set_dirty(self, dirty):
         """Setter for self.__dirty.
@@ -1126,6 +1191,41 @@ class Cam(object):
         else:
             raise ValueError("The speed must be greater than 0")
 
+    def snapshot(self):
+        """
+        Returns the Cam Data in the version 3 binary format as a list of buffers, to be written
+        with write_file while the cam is edited
+        """
+
+        header = zeros(1, HEADER_DTYPE)
+        header["magic"] = MAGIC_NUMBER
+        header["version"] = FILE_VERSION
+        header["angle_steps"] = self.angle_steps()
+        header["displacement_steps"] = self.displacement_steps()
+        header["speed"] = self.__speed
+        header["radius"] = self.__radius
+        header["profiles"] = len(self.__cams)
+
+        labels = [cam.label().encode("utf-8") for cam in self.__cams]
+        records = [points_to_records(cam) for cam in self.__cams]
+        table = zeros(len(self.__cams), PROFILE_DTYPE)
+        offset = HEADER_DTYPE.itemsize + table.nbytes
+        for i, label in enumerate(labels):
+            table[i]["label_offset"] = offset
+            table[i]["label_length"] = len(label)
+            offset += len(label)
+        for i, cam in enumerate(self.__cams):
+            table[i]["offset"] = offset
+            table[i]["points"] = len(records[i])
+            table[i]["color"] = cam.color().encode("ascii")
+            table[i]["height"] = cam.height()
+            table[i]["depth"] = cam.depth()
+            table[i]["min_displacement"] = records[i]["displacement"].min()
+            table[i]["max_displacement"] = records[i]["displacement"].max()
+            offset += records[i].nbytes
+
+        return [header, table, b"".join(labels)] + records
+
     def speed(self):
         """
         Returns the cam rotation speed
@@ -1133,25 +1233,208 @@ class Cam(object):
 
         return self.__speed
 
+    def __load_records(self, lazy):
+        """Load a version 3 file mapping it in memory.
+
+        Parameters:
+        lazy (bool): give the profiles a loader instead of reading their points
+
+        Return:
+        bool: a boolean to represent if the load was successful
+        str: a message
+        """
+
+        data = memmap(self.__file_name, dtype=uint8, mode='r')
+        if len(data) < HEADER_DTYPE.itemsize:
+            raise IOError("unrecognized file type")
+        header = data[:HEADER_DTYPE.itemsize].view(HEADER_DTYPE)[0]
+        if header["magic"] != MAGIC_NUMBER:
+            raise IOError("unrecognized file type")
+        if header["version"] != FILE_VERSION:
+            raise IOError("unrecognized file version")
+
+        start = HEADER_DTYPE.itemsize
+        table = data[start:start + int(header["profiles"]) * PROFILE_DTYPE.itemsize].view(PROFILE_DTYPE)
+        if len(table) != header["profiles"]:
+            raise IOError("truncated file")
+        cams = []
+        for entry in table:
+            label = data[entry["label_offset"]:entry["label_offset"] + entry["label_length"]].tobytes()
+            records = data[entry["offset"]:entry["offset"] + entry["points"] * POINT_DTYPE.itemsize]
+            if len(records) != entry["points"] * POINT_DTYPE.itemsize:
+                raise IOError("truncated file")
+            if lazy:
+                cam_profile = CamProfile([], label.decode("utf-8"), entry["color"].decode("ascii"))
+                # the loader keeps the file mapped: a file replaced on disk leaves the mapping on the old one
+                cam_profile.set_loader(partial(points_from_records, records.view(POINT_DTYPE)),
+                                       float(entry["min_displacement"]), float(entry["max_displacement"]))
+            else:
+                cam_profile = CamProfile(points_from_records(records.view(POINT_DTYPE)), label.decode("utf-8"),
+                                         entry["color"].decode("ascii"))
+            cam_profile.set_height(float(entry["height"]))
+            cam_profile.set_depth(float(entry["depth"]))
+            cams.append(cam_profile)
+
+        self.__angle_steps = int(header["angle_steps"])
+        self.__displacement_steps = int(header["displacement_steps"])
+        self.__speed = float(header["speed"])
+        self.__radius = float(header["radius"])
+        self.__cams = cams
+        self.__dirty = False
+        return True, "Loaded {0} cam from {1}".format(len(self.__cams), os.path.basename(self.__file_name))
+
+
+def check_drum(cam, length, bore=None):
+    """
+    Raises ValueError if the drum of the cam radius and length, from the drum face at displacement 0 along the
+    grooves, cannot have a bore of diameter bore, None without a bore
+    """
+
+    if length <= 0:
+        raise ValueError("The drum length must be greater than 0")
+    floor = cam.radius() - max((cam_profile.depth() for cam_profile in cam), default=0)
+    if bore is not None and not 0 <= bore < 2 * floor:
+        raise ValueError("The bore must be between 0 and {0:.3f} mm, the diameter of the deepest groove floor"
+                         .format(2 * floor))
+
+
+def chord_deviation(polyline, radius, indexes):
+    """
+    Returns the maximum distance of the polyline samples from the chords between the samples at indexes,
+    measured as decimate measures it on the polyline unrolled on the cylinder of the radius
+    """
+
+    x = polyline[:, 0] * (2 * pi * radius / 360)
+    y = polyline[:, 1]
+    end = clip(searchsorted(indexes, arange(len(polyline)), side="right"), 1, len(indexes) - 1)
+    first = indexes[end - 1]
+    last = indexes[end]
+    dx = x[last] - x[first]
+    dy = y[last] - y[first]
+    px = x - x[first]
+    py = y - y[first]
+    # distance from the chord, clipped to its ends
+    length = dx * dx + dy * dy
+    t = clip((px * dx + py * dy) / where(length > 0, length, 1), 0, 1)
+    return float(hypot(px - t * dx, py - t * dy).max())
+
+
+def color_name(color):
+    """
+    Returns the color as a "#rrggbb" string, the colors saved by the Qt versions are converted
+    """
+
+    if isinstance(color, str):
+        return color
+    from PySide6.QtGui import QColor
+    return QColor(color).name()
+
+
+def decimate(polyline, radius, tolerance):
+    """
+    Returns the indexes of the polyline samples kept by the Ramer-Douglas-Peucker decimation and the maximum
+    distance of the dropped samples from the decimated polyline
+
+    The distances are measured in millimetres on the polyline unrolled on the cylinder of the radius,
+    the first and the last samples are always kept
+    """
+
+    x = polyline[:, 0] * (2 * pi * radius / 360)
+    y = polyline[:, 1]
+    keep = zeros(len(polyline), dtype=bool)
+    keep[0] = keep[-1] = True
+    deviation = 0.0
+    spans = [(0, len(polyline) - 1)]
+    while spans:
+        first, last = spans.pop()
+        if last - first < 2:
+            continue
+        dx = x[last] - x[first]
+        dy = y[last] - y[first]
+        px = x[first + 1:last] - x[first]
+        py = y[first + 1:last] - y[first]
+        # distance from the chord, clipped to its ends
+        length = dx * dx + dy * dy
+        t = clip((px * dx + py * dy) / length, 0, 1) if length > 0 else 0
+        distances = hypot(px - t * dx, py - t * dy)
+        index = int(argmax(distances))
+        if distances[index] > tolerance:
+            split = first + 1 + index
+            keep[split] = True
+            spans.append((first, split))
+            spans.append((split, last))
+        else:
+            deviation = max(deviation, float(distances[index]))
+    return flatnonzero(keep), deviation
+
+
+@lru_cache(maxsize=law_params_cache_size)
+def law_params(law, prev_angle, prev_displacement, angle, displacement):
+    """
+    Returns the closed form parameters of the law between the two points, cached on the segment ends
+
+    Sinusoidal: (a, b, c, d) of c * sin((a * x + b) * pi / 180) + d with the min and max in the two points
+    Parabolic: (a1, b1, c1, a2, b2, c2) of the two parabolas with the vertex in the two points, joined in the
+    middle of the segment
+    """
+
+    if law == CamPoint._LAW_SINUSOIDAL:
+        a = 180 / (angle - prev_angle)
+        return a, -90 - a * prev_angle, (displacement - prev_displacement) / 2, (displacement + prev_displacement) / 2
+    elif law == CamPoint._LAW_PARABOLIC:
+        mid_angle = (prev_angle + angle) / 2
+        mid_displacement = (prev_displacement + displacement) / 2
+        a1 = (mid_displacement - prev_displacement) / (mid_angle - prev_angle) ** 2
+        a2 = (mid_displacement - displacement) / (mid_angle - angle) ** 2
+        return (a1, -2 * a1 * prev_angle, prev_displacement + a1 * prev_angle ** 2,
+                a2, -2 * a2 * angle, displacement + a2 * angle ** 2)
+    else:
+        raise ValueError("Law {0} has no parameters".format(law))
+
+
+def points_from_records(records):
+    """
+    Returns the cam points of an array of POINT_DTYPE records
+    """
+
+    return [CamPoint(angle, displacement, law) for angle, displacement, law in
+            zip(records["angle"].tolist(), records["displacement"].tolist(), records["law"].tolist())]
+
+
+def points_to_records(cam_profile):
+    """
+    Returns the points of the cam profile as an array of POINT_DTYPE records
+    """
+
+    return array([(point.angle(), point.displacement(), point.law()) for point in cam_profile], dtype=POINT_DTYPE)
+
 
-def qColor_to_ACI(color):
+def write_file(file_name, buffers):
     """
-    Returns the ACI index closest to the given color
+    Writes the buffers to a temporary file in the directory of file_name, flushes it to the disk
+    and renames it to file_name, the old file is replaced only by a complete one
     """
 
-    min_distance = sys.maxsize
-    chosen = 0
-    qcolor = QColor(color)
-    r, g, b, alpha = qcolor.getRgb()
-    i = 0
-
-    for red, green, blue in _ACI_:
-        distance = ((red - r) ** 2 +
-                    (green - g) ** 2 +
-                    (blue - b) ** 2)
-        if distance < min_distance:
-            min_distance = distance
-            chosen = i
-        i += 1
-
-    return chosen
+    directory = os.path.dirname(os.path.abspath(file_name))
+    temp_name = os.path.join(directory, ".{0}.{1}.tmp".format(os.path.basename(file_name), os.urandom(4).hex()))
+    # created as open() does, with the permissions of the umask or of the replaced file
+    fd = os.open(temp_name, os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, "O_BINARY", 0), 0o666)
+    try:
+        with os.fdopen(fd, 'wb') as fh:
+            for buffer in buffers:
+                fh.write(buffer)
+            fh.flush()
+            os.fsync(fh.fileno())
+        if os.path.exists(file_name):
+            shutil.copymode(file_name, temp_name)
+        os.replace(temp_name, file_name)
+    except BaseException:
+        os.remove(temp_name)
+        raise
+    if os.name == "posix":
+        # makes the rename durable
+        fd = os.open(directory, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
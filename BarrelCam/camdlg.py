@@ -11,9 +11,10 @@
 #
 
 import copy
+import os
 
 from PySide6.QtCore import QMarginsF, Qt
-from PySide6.QtGui import QBrush, QPageLayout, QPainter, QPixmap
+from PySide6.QtGui import QBrush, QColor, QPageLayout, QPainter, QPixmap
 from PySide6.QtPrintSupport import QPrintDialog, QPrinter
 from PySide6.QtWidgets import QCheckBox, QColorDialog, QComboBox, QDialog, QDialogButtonBox, QDoubleSpinBox, \
     QGridLayout, QHBoxLayout, QLabel, QLineEdit, QPushButton, QSpinBox, QVBoxLayout, QTabWidget, QWidget
@@ -255,7 +256,8 @@ class CamProfileDlg(QDialog):
         """
 
         return camdata.CamProfile([camdata.CamPoint(360, self.displacement_spinbox.value(),
-                                  self.law_combobox.currentIndex())], self.labelLineEdit.text(), self.color)
+                                  self.law_combobox.currentIndex())], self.labelLineEdit.text(),
+                                  QColor(self.color).name())
 
     def new_pixmap(self, width, height):
         """
@@ -292,7 +294,7 @@ class CamProfileEditDlg(QDialog):
         super(CamProfileEditDlg, self).__init__(parent)
 
         self.cam_profile = copy.deepcopy(cam_profile)
-        self.color = self.cam_profile.color()
+        self.color = QColor(self.cam_profile.color())
 
         label_label = QLabel("&Label")
         self.label_lineedit = QLineEdit()
@@ -356,8 +358,8 @@ class CamProfileEditDlg(QDialog):
         if label != self.cam_profile.label():
             self.cam_profile.set_label(label)
             changed = True
-        if self.color != self.cam_profile.color():
-            self.cam_profile.set_color(self.color)
+        if self.color.name() != self.cam_profile.color():
+            self.cam_profile.set_color(self.color.name())
             changed = True
         if not changed:
             return False
@@ -504,6 +506,62 @@ class CamSettings(QDialog):
         self.pitch_spinbox.setSingleStep(1)
         self.pitch_spinbox.setValue(self.main_window.STP_angle_pitch)
         pitch_label.setBuddy(self.pitch_spinbox)
+        jobs_label = QLabel("STP &jobs:")
+        self.jobs_spinbox = QSpinBox()
+        self.jobs_spinbox.setAlignment(Qt.AlignRight)
+        self.jobs_spinbox.setRange(1, max(os.cpu_count() or 1, self.main_window.STP_jobs))
+        self.jobs_spinbox.setSingleStep(1)
+        self.jobs_spinbox.setValue(self.main_window.STP_jobs)
+        jobs_label.setBuddy(self.jobs_spinbox)
+        self.stp_tolerance_checkbox = QCheckBox()
+        self.stp_tolerance_checkbox.setChecked(self.main_window.STP_tolerance is not None)
+        self.stp_tolerance_label = QLabel("STP spine t&olerance:")
+        self.stp_tolerance_spinbox = QDoubleSpinBox()
+        self.stp_tolerance_spinbox.setAlignment(Qt.AlignRight)
+        self.stp_tolerance_spinbox.setSuffix(" mm")
+        self.stp_tolerance_spinbox.setDecimals(3)
+        self.stp_tolerance_spinbox.setRange(0.001, 1.0)
+        self.stp_tolerance_spinbox.setSingleStep(0.005)
+        self.stp_tolerance_spinbox.setValue(0.01)
+        self.stp_tolerance_label.setBuddy(self.stp_tolerance_spinbox)
+        if self.main_window.STP_tolerance is not None:
+            self.stp_tolerance_spinbox.setValue(self.main_window.STP_tolerance)
+        self.drum_checkbox = QCheckBox()
+        self.drum_checkbox.setChecked(self.main_window.STP_drum_length is not None)
+        self.drum_length_label = QLabel("STP and STL dr&um length:")
+        self.drum_length_spinbox = QDoubleSpinBox()
+        self.drum_length_spinbox.setAlignment(Qt.AlignRight)
+        self.drum_length_spinbox.setSuffix(" mm")
+        self.drum_length_spinbox.setRange(1.0, 5000.0)
+        self.drum_length_spinbox.setSingleStep(10.0)
+        self.drum_length_spinbox.setValue(500.0)
+        self.drum_length_label.setBuddy(self.drum_length_spinbox)
+        if self.main_window.STP_drum_length is not None:
+            self.drum_length_spinbox.setValue(self.main_window.STP_drum_length)
+        self.bore_label = QLabel("STP and STL drum &bore:")
+        self.bore_spinbox = QDoubleSpinBox()
+        self.bore_spinbox.setAlignment(Qt.AlignRight)
+        self.bore_spinbox.setSuffix(" mm")
+        self.bore_spinbox.setSpecialValueText("None")
+        self.bore_spinbox.setRange(0, 5000.0)
+        self.bore_spinbox.setSingleStep(1.0)
+        self.bore_spinbox.setValue(self.main_window.STP_bore)
+        self.bore_label.setBuddy(self.bore_spinbox)
+        self.tolerance_checkbox = QCheckBox()
+        self.tolerance_checkbox.setChecked(self.main_window.export_tolerance is not None)
+        self.tolerance_label = QLabel("DXF, CSV and STL &tolerance:")
+        self.tolerance_spinbox = QDoubleSpinBox()
+        self.tolerance_spinbox.setAlignment(Qt.AlignRight)
+        self.tolerance_spinbox.setSuffix(" mm")
+        self.tolerance_spinbox.setDecimals(3)
+        self.tolerance_spinbox.setRange(0.001, 1.0)
+        self.tolerance_spinbox.setSingleStep(0.005)
+        self.tolerance_spinbox.setValue(0.01)
+        self.tolerance_label.setBuddy(self.tolerance_spinbox)
+        if self.main_window.export_tolerance is not None:
+            self.tolerance_spinbox.setValue(self.main_window.export_tolerance)
+        self.splines_checkbox = QCheckBox("DXF spli&nes")
+        self.splines_checkbox.setChecked(self.main_window.DXF_splines)
 
         x_steps_label = QLabel("&X Tick Steps:")
         self.x_steps_spinbox = QSpinBox()
@@ -543,7 +601,7 @@ class CamSettings(QDialog):
 
             for camProfile in self.cam:
                 self.cam_combobox.addItem(camProfile.label())
-                self.colors.append(camProfile.color())
+                self.colors.append(QColor(camProfile.color()))
                 self.heights.append(camProfile.height())
                 self.depths.append(camProfile.depth())
 
@@ -598,6 +656,20 @@ class CamSettings(QDialog):
         stp_setting_grid = QGridLayout()
         stp_setting_grid.addWidget(pitch_label, 0, 0)
         stp_setting_grid.addWidget(self.pitch_spinbox, 0, 1)
+        stp_setting_grid.addWidget(self.stp_tolerance_checkbox, 1, 0)
+        stp_setting_grid.addWidget(self.stp_tolerance_label, 1, 1)
+        stp_setting_grid.addWidget(self.stp_tolerance_spinbox, 1, 2)
+        stp_setting_grid.addWidget(self.drum_checkbox, 2, 0)
+        stp_setting_grid.addWidget(self.drum_length_label, 2, 1)
+        stp_setting_grid.addWidget(self.drum_length_spinbox, 2, 2)
+        stp_setting_grid.addWidget(self.bore_label, 3, 1)
+        stp_setting_grid.addWidget(self.bore_spinbox, 3, 2)
+        stp_setting_grid.addWidget(self.tolerance_checkbox, 4, 0)
+        stp_setting_grid.addWidget(self.tolerance_label, 4, 1)
+        stp_setting_grid.addWidget(self.tolerance_spinbox, 4, 2)
+        stp_setting_grid.addWidget(self.splines_checkbox, 5, 1)
+        stp_setting_grid.addWidget(jobs_label, 6, 0)
+        stp_setting_grid.addWidget(self.jobs_spinbox, 6, 1)
 
         grid_setting_grid = QGridLayout()
         grid_setting_grid.addWidget(x_steps_label, 0, 0)
@@ -614,7 +686,7 @@ class CamSettings(QDialog):
 
         tab_widget.addTab(cam_setting_widget, "&Cam")
         tab_widget.addTab(limits_setting_widget, "&Limits")
-        tab_widget.addTab(stp_setting_widget, "&STP Settings")
+        tab_widget.addTab(stp_setting_widget, "&Export Settings")
         tab_widget.addTab(grid_setting_widget, "&Grid")
 
         layout = QVBoxLayout()
@@ -627,6 +699,9 @@ class CamSettings(QDialog):
         self.acc_checkbox.stateChanged.connect(self.update_limits)
         self.min_distance_checkbox.stateChanged.connect(self.update_limits)
         self.max_distance_checkbox.stateChanged.connect(self.update_limits)
+        self.tolerance_checkbox.stateChanged.connect(self.update_limits)
+        self.stp_tolerance_checkbox.stateChanged.connect(self.update_limits)
+        self.drum_checkbox.stateChanged.connect(self.update_limits)
         self.update_limits()
 
         buttonbox.accepted.connect(self.accept)
@@ -687,6 +762,15 @@ class CamSettings(QDialog):
         self.min_distance_spinbox.setDisabled(not self.min_distance_checkbox.isChecked())
         self.max_distance_label.setEnabled(self.max_distance_checkbox.isChecked())
         self.max_distance_spinbox.setDisabled(not self.max_distance_checkbox.isChecked())
+        self.tolerance_label.setEnabled(self.tolerance_checkbox.isChecked())
+        self.tolerance_spinbox.setDisabled(not self.tolerance_checkbox.isChecked())
+        self.pitch_spinbox.setDisabled(self.stp_tolerance_checkbox.isChecked())
+        self.stp_tolerance_label.setEnabled(self.stp_tolerance_checkbox.isChecked())
+        self.stp_tolerance_spinbox.setDisabled(not self.stp_tolerance_checkbox.isChecked())
+        self.drum_length_label.setEnabled(self.drum_checkbox.isChecked())
+        self.drum_length_spinbox.setDisabled(not self.drum_checkbox.isChecked())
+        self.bore_label.setEnabled(self.drum_checkbox.isChecked())
+        self.bore_spinbox.setDisabled(not self.drum_checkbox.isChecked())
 
     #def update_label(self):
     #    """
@@ -705,7 +789,7 @@ class CamSettings(QDialog):
         cam.set_radius(self.radius_spinbox.value())
         if len(self.cam) > 0:
             for i, cam_profile in enumerate(cam):
-                cam_profile.set_color(self.colors[i])
+                cam_profile.set_color(self.colors[i].name())
                 cam_profile.set_depth(self.depths[i])
                 cam_profile.set_height(self.heights[i])
 
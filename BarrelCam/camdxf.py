@@ -0,0 +1,480 @@
+# Copyright 2022 Simone <sanfe75@gmail.com>
+#
+# Licensed under the Apache License, Version 2.0(the "License"); you may not use this file except
+# in compliance with the License.You may obtain a copy of the License at:
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software distributed under the License is distributed
+# on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the License
+# for the specific language governing permissions and limitations under the License.
+#
+
+"""
+DXF export, imported only when a cam is exported to DXF
+"""
+
+import os
+import sys
+
+from ezdxf.document import Drawing
+from ezdxf.entities.lwpolyline import LWPolylinePoints
+from ezdxf.filemanagement import dxf_file_info
+from ezdxf.lldxf.const import acad_release_to_dxf_version
+from ezdxf.lldxf.tagger import ascii_tags_loader, tag_compiler
+from ezdxf.math import global_bspline_interpolation
+from numpy import array, clip, column_stack, concatenate, diff, float64, hypot, linspace, minimum, pi, searchsorted, \
+    unique, zeros
+
+from BarrelCam import camdata
+
+TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "templates")
+DXF_VERSIONS = ("AC1009", "AC1015", "AC1018", "AC1021", "AC1024", "AC1027")
+DXF_VERSION = "AC1015"
+
+spline_tolerance = 0.01  # mm, fit tolerance of the splines exported without a tolerance
+spline_fit_attempts = 12  # times the fit points are refined before every sample becomes a fit point
+
+_templates = {}  # compiled tags of the templates read, by DXF version
+
+_ACI_ = ((0, 0, 0),
+         (255, 0, 0),
+         (255, 255, 0),
+         (0, 255, 0),
+         (0, 255, 255),
+         (0, 0, 255),
+         (255, 0, 255),
+         (255, 255, 255),
+         (128, 128, 128),
+         (192, 192, 192),
+         (255, 0, 0),
+         (255, 127, 127),
+         (204, 0, 0),
+         (204, 102, 102),
+         (153, 0, 0),
+         (153, 76, 76),
+         (127, 0, 0),
+         (127, 63, 63),
+         (76, 0, 0),
+         (76, 38, 38),
+         (255, 63, 0),
+         (255, 159, 127),
+         (204, 51, 0),
+         (204, 127, 102),
+         (153, 38, 0),
+         (153, 95, 76),
+         (127, 31, 0),
+         (127, 79, 63),
+         (76, 19, 0),
+         (76, 47, 38),
+         (255, 127, 0),
+         (255, 191, 127),
+         (204, 102, 0),
+         (204, 153, 102),
+         (153, 76, 0),
+         (153, 114, 76),
+         (127, 63, 0),
+         (127, 95, 63),
+         (76, 38, 0),
+         (76, 57, 38),
+         (255, 191, 0),
+         (255, 223, 127),
+         (204, 153, 0),
+         (204, 178, 102),
+         (153, 114, 0),
+         (153, 133, 76),
+         (127, 95, 0),
+         (127, 111, 63),
+         (76, 57, 0),
+         (76, 66, 38),
+         (255, 255, 0),
+         (255, 255, 127),
+         (204, 204, 0),
+         (204, 204, 102),
+         (152, 152, 0),
+         (152, 152, 76),
+         (127, 127, 0),
+         (127, 127, 63),
+         (76, 76, 0),
+         (76, 76, 38),
+         (191, 255, 0),
+         (223, 255, 127),
+         (153, 204, 0),
+         (178, 204, 102),
+         (114, 152, 0),
+         (133, 152, 76),
+         (95, 127, 0),
+         (111, 127, 63),
+         (57, 76, 0),
+         (66, 76, 38),
+         (127, 255, 0),
+         (191, 255, 127),
+         (102, 204, 0),
+         (153, 204, 102),
+         (76, 152, 0),
+         (114, 152, 76),
+         (63, 127, 0),
+         (95, 127, 63),
+         (38, 76, 0),
+         (57, 76, 38),
+         (63, 255, 0),
+         (159, 255, 127),
+         (51, 204, 0),
+         (127, 204, 102),
+         (38, 152, 0),
+         (95, 152, 76),
+         (31, 127, 0),
+         (79, 127, 63),
+         (19, 76, 0),
+         (47, 76, 38),
+         (0, 255, 0),
+         (127, 255, 127),
+         (0, 204, 0),
+         (102, 204, 102),
+         (0, 152, 0),
+         (76, 152, 76),
+         (0, 127, 0),
+         (63, 127, 63),
+         (0, 76, 0),
+         (38, 76, 38),
+         (0, 255, 63),
+         (127, 255, 159),
+         (0, 204, 51),
+         (102, 204, 127),
+         (0, 152, 38),
+         (76, 152, 95),
+         (0, 127, 31),
+         (63, 127, 79),
+         (0, 76, 19),
+         (38, 76, 47),
+         (0, 255, 127),
+         (127, 255, 191),
+         (0, 204, 102),
+         (102, 204, 153),
+         (0, 152, 76),
+         (76, 152, 114),
+         (0, 127, 63),
+         (63, 127, 95),
+         (0, 76, 38),
+         (38, 76, 57),
+         (0, 255, 191),
+         (127, 255, 223),
+         (0, 204, 153),
+         (102, 204, 178),
+         (0, 152, 114),
+         (76, 152, 133),
+         (0, 127, 95),
+         (63, 127, 111),
+         (0, 76, 57),
+         (38, 76, 66),
+         (0, 255, 255),
+         (127, 255, 255),
+         (0, 204, 204),
+         (102, 204, 204),
+         (0, 152, 152),
+         (76, 152, 152),
+         (0, 127, 127),
+         (63, 127, 127),
+         (0, 76, 76),
+         (38, 76, 76),
+         (0, 191, 255),
+         (127, 223, 255),
+         (0, 153, 204),
+         (102, 178, 204),
+         (0, 114, 152),
+         (76, 133, 152),
+         (0, 95, 127),
+         (63, 111, 127),
+         (0, 57, 76),
+         (38, 66, 76),
+         (0, 127, 255),
+         (127, 191, 255),
+         (0, 102, 204),
+         (102, 153, 204),
+         (0, 76, 152),
+         (76, 114, 152),
+         (0, 63, 127),
+         (63, 95, 127),
+         (0, 38, 76),
+         (38, 57, 76),
+         (0, 63, 255),
+         (127, 159, 255),
+         (0, 51, 204),
+         (102, 127, 204),
+         (0, 38, 152),
+         (76, 95, 152),
+         (0, 31, 127),
+         (63, 79, 127),
+         (0, 19, 76),
+         (38, 47, 76),
+         (0, 0, 255),
+         (127, 127, 255),
+         (0, 0, 204),
+         (102, 102, 204),
+         (0, 0, 152),
+         (76, 76, 152),
+         (0, 0, 127),
+         (63, 63, 127),
+         (0, 0, 76),
+         (38, 38, 76),
+         (63, 0, 255),
+         (159, 127, 255),
+         (51, 0, 204),
+         (127, 102, 204),
+         (38, 0, 152),
+         (95, 76, 152),
+         (31, 0, 127),
+         (79, 63, 127),
+         (19, 0, 76),
+         (47, 38, 76),
+         (127, 0, 255),
+         (191, 127, 255),
+         (102, 0, 204),
+         (153, 102, 204),
+         (76, 0, 152),
+         (114, 76, 152),
+         (63, 0, 127),
+         (95, 63, 127),
+         (38, 0, 76),
+         (57, 38, 76),
+         (191, 0, 255),
+         (223, 127, 255),
+         (153, 0, 204),
+         (178, 102, 204),
+         (114, 0, 152),
+         (133, 76, 152),
+         (95, 0, 127),
+         (111, 63, 127),
+         (57, 0, 76),
+         (66, 38, 76),
+         (255, 0, 255),
+         (255, 127, 255),
+         (204, 0, 204),
+         (204, 102, 204),
+         (152, 0, 152),
+         (152, 76, 152),
+         (127, 0, 127),
+         (127, 63, 127),
+         (76, 0, 76),
+         (76, 38, 76),
+         (255, 0, 191),
+         (255, 127, 223),
+         (204, 0, 153),
+         (204, 102, 178),
+         (152, 0, 114),
+         (152, 76, 133),
+         (127, 0, 95),
+         (127, 63, 111),
+         (76, 0, 57),
+         (76, 38, 66),
+         (255, 0, 127),
+         (255, 127, 191),
+         (204, 0, 102),
+         (204, 102, 153),
+         (152, 0, 76),
+         (152, 76, 114),
+         (127, 0, 63),
+         (127, 63, 95),
+         (76, 0, 38),
+         (76, 38, 57),
+         (255, 0, 63),
+         (255, 127, 159),
+         (204, 0, 51),
+         (204, 102, 127),
+         (152, 0, 38),
+         (152, 76, 95),
+         (127, 0, 31),
+         (127, 63, 79),
+         (76, 0, 19),
+         (76, 38, 47),
+         (51, 51, 51),
+         (91, 91, 91),
+         (132, 132, 132),
+         (173, 173, 173),
+         (214, 214, 214),
+         (255, 255, 255))
+
+
+def add_segments(model_space, cam_profile, radius, tolerance, dxfattribs, angle_steps=camdata.angle_steps):
+    """
+    Adds a LINE for every dwell and a SPLINE for every sinusoidal or parabolic segment of cam_profile,
+    unrolled on the cylinder of the radius, returns the number of splines and lines and the maximum deviation
+    of the splines from the samples of the segments, taken angle_steps per degree
+    """
+
+    scale = -2 * pi * radius / 360
+    splines = lines = 0
+    deviation = 0.0
+    cam_profile.check_cam()
+    prev_point = camdata.CamPoint(0, cam_profile[-1].displacement())
+    # the last dwell runs to 360 degrees
+    for point in list(cam_profile) + [camdata.CamPoint(360.0, cam_profile[-1].displacement())]:
+        if point.angle() > prev_point.angle():
+            if point.law() == camdata.CamPoint._LAW_LINEAR:
+                model_space.add_line((scale * prev_point.angle(), prev_point.displacement()),
+                                     (scale * point.angle(), point.displacement()), dxfattribs=dxfattribs)
+                lines += 1
+            else:
+                samples = cam_profile.segment_array(point, prev_point, True, angle_steps)
+                samples = concatenate((array([[prev_point.angle(), prev_point.displacement()]], dtype=float64),
+                                       samples[samples[:, 0] > prev_point.angle()],
+                                       array([[point.angle(), point.displacement()]], dtype=float64)))
+                spline, spline_deviation = fit_spline(samples, radius, tolerance)
+                model_space.add_open_spline(spline.control_points, spline.degree, spline.knots(),
+                                            dxfattribs=dxfattribs)
+                splines += 1
+                deviation = max(deviation, spline_deviation)
+        prev_point = point
+    return splines, lines, deviation
+
+
+def color_to_ACI(color):
+    """
+    Returns the ACI index closest to the given "#rrggbb" color
+    """
+
+    min_distance = sys.maxsize
+    chosen = 0
+    r, g, b = (int(color[i:i + 2], 16) for i in (1, 3, 5))
+    i = 0
+
+    for red, green, blue in _ACI_:
+        distance = ((red - r) ** 2 +
+                    (green - g) ** 2 +
+                    (blue - b) ** 2)
+        if distance < min_distance:
+            min_distance = distance
+            chosen = i
+        i += 1
+
+    return chosen
+
+
+def fit_spline(samples, radius, tolerance):
+    """
+    Returns the cubic B-spline interpolating the samples of a segment within tolerance on the cylinder
+    of the radius and its maximum distance from the samples
+
+    The fit points are the samples kept by the decimation, refined halving the decimation tolerance
+    until the spline is within tolerance
+    """
+
+    scale = -2 * pi * radius / 360
+    unrolled = column_stack((scale * samples[:, 0], samples[:, 1]))
+    # the spline is smoother than the decimated polyline, the fit starts from a coarser decimation
+    fit_tolerance = tolerance * 32
+    for _ in range(spline_fit_attempts):
+        indexes, _ = camdata.decimate(samples, radius, fit_tolerance)
+        if len(indexes) < 4:
+            indexes = unique(linspace(0, len(samples) - 1, min(4, len(samples))).astype(int))
+        spline = global_bspline_interpolation(unrolled[indexes].tolist(), degree=min(3, len(indexes) - 1))
+        deviation = spline_deviation(spline, unrolled)
+        if deviation <= tolerance:
+            return spline, deviation
+        fit_tolerance /= 2
+    spline = global_bspline_interpolation(unrolled.tolist(), degree=min(3, len(unrolled) - 1))
+    return spline, spline_deviation(spline, unrolled)
+
+
+def new_drawing(dxf_version=DXF_VERSION):
+    """
+    Returns a new drawing from the template of dxf_version, an AutoCAD version like AC1015 or a release like R2000
+
+    The template is parsed the first time and its tags are kept for the next drawings
+    """
+
+    dxf_version = acad_release_to_dxf_version.get(dxf_version, dxf_version)
+    if dxf_version not in DXF_VERSIONS:
+        raise ValueError("unsupported DXF version {0}, use one of {1}".format(dxf_version, ", ".join(DXF_VERSIONS)))
+    tags = _templates.get(dxf_version)
+    if tags is None:
+        template_name = os.path.join(TEMPLATE_DIR, dxf_version + ".dxf")
+        with open(template_name, encoding=dxf_file_info(template_name).encoding) as fh:
+            tags = list(tag_compiler(ascii_tags_loader(fh)))
+        _templates[dxf_version] = tags
+    return Drawing.from_tags(tags)
+
+
+def save_2D_DXF(cam, file_name, tolerance=None, splines=False, dxf_version=DXF_VERSION):
+    """
+    Exports the cam to file_name in the dxf_version format
+
+    Every profile is an LWPOLYLINE on its own layer, a POLYLINE in AC1009, unrolled on the cylinder of the cam
+    radius and sampled at the cam angle steps, with a tolerance in millimetres the polylines are decimated.
+    With splines every segment of the laws is a SPLINE fitted within the tolerance and every dwell is a LINE
+    """
+
+    drawing = new_drawing(dxf_version)
+    model_space = drawing.modelspace()
+    if splines:
+        if drawing.dxfversion == "AC1009":
+            raise ValueError("AC1009 has no splines, use AC1015 or later")
+        if tolerance is None:
+            tolerance = spline_tolerance
+        counts = [0, 0]
+        deviation = 0.0
+        for cam_profile in cam:
+            layer = drawing.layers.add(name=cam_profile.label())
+            layer.set_color(color_to_ACI(cam_profile.color()))
+            profile_splines, profile_lines, profile_deviation = add_segments(
+                model_space, cam_profile, cam.radius(), tolerance, {"layer": cam_profile.label()}, cam.angle_steps())
+            counts[0] += profile_splines
+            counts[1] += profile_lines
+            deviation = max(deviation, profile_deviation)
+        drawing.saveas(file_name)
+        return True, "Cam saved to {0}, {1} splines and {2} lines, max deviation {3:.4f} mm".format(
+            os.path.basename(file_name), counts[0], counts[1], deviation)
+
+    if tolerance is None:
+        polylines = [cam_profile.polyline_array(True, cam.angle_steps()) for cam_profile in cam]
+    else:
+        polylines, samples, deviation = cam.decimated_polylines(tolerance)
+    for cam_profile, points in zip(cam, polylines):
+        layer = drawing.layers.add(name=cam_profile.label())
+        layer.set_color(color_to_ACI(cam_profile.color()))
+        unrolled = column_stack((-2 * pi * cam.radius() * points[:, 0] / 360, points[:, 1]))
+        if drawing.dxfversion == "AC1009":
+            # ezdxf converts the vertices one by one, plain floats are faster than the numpy rows
+            model_space.add_polyline2d(unrolled.tolist(), dxfattribs={"layer": cam_profile.label()})
+        else:
+            # the LWPOLYLINE keeps its vertices as x, y, start width, end width and bulge rows:
+            # extending them with the whole array skips the conversion of every vertex
+            polyline = model_space.add_lwpolyline([], dxfattribs={"layer": cam_profile.label()})
+            vertices = zeros((len(unrolled), LWPolylinePoints.VERTEX_SIZE))
+            vertices[:, :2] = unrolled
+            polyline.lwpoints.extend(vertices)
+    drawing.saveas(file_name)
+    message = "Cam saved to {0}".format(os.path.basename(file_name))
+    if tolerance is not None:
+        message += ", {0} vertices reduced to {1}, max deviation {2:.4f} mm".format(
+            samples, sum(len(points) for points in polylines), deviation)
+    return True, message
+
+
+def spline_deviation(spline, points):
+    """
+    Returns the maximum distance of the points from the spline, the points and the spline run
+    along decreasing x
+    """
+
+    curve = array(list(spline.approximate(segments=8 * len(points))))[:, :2]
+    if (diff(curve[:, 0]) >= 0).any():
+        return float("inf")
+    # mirrored to run along increasing x
+    x = -points[:, 0]
+    y = points[:, 1]
+    curve_x = -curve[:, 0]
+    curve_y = curve[:, 1]
+    index = clip(searchsorted(curve_x, x), 1, len(curve) - 1)
+    distance = None
+    # the chords around the sample, the nearest one may be the previous or the next
+    for offset in (-1, 0, 1):
+        end = clip(index + offset, 1, len(curve) - 1)
+        start_x = curve_x[end - 1]
+        start_y = curve_y[end - 1]
+        dx = curve_x[end] - start_x
+        dy = curve_y[end] - start_y
+        t = clip(((x - start_x) * dx + (y - start_y) * dy) / (dx * dx + dy * dy), 0, 1)
+        chord_distance = hypot(x - start_x - t * dx, y - start_y - t * dy)
+        distance = chord_distance if distance is None else minimum(distance, chord_distance)
+    return float(distance.max())
@@ -0,0 +1,409 @@
+# Copyright 2022 Simone <sanfe75@gmail.com>
+#
+# Licensed under the Apache License, Version 2.0(the "License"); you may not use this file except
+# in compliance with the License.You may obtain a copy of the License at:
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software distributed under the License is distributed
+# on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the License
+# for the specific language governing permissions and limitations under the License.
+#
+
+"""
+Append-only journal of the edits of a cam file
+
+The journal is a text file next to the cam file, the first line names the base file the edits apply to,
+the cam file or its autosave, and the editor process writing the journal, every other line is a JSON delta
+"""
+
+import json
+import os
+import socket
+import threading
+
+from BarrelCam import camdata
+
+JOURNAL_SUFFIX = ".journal"
+AUTOSAVE_SUFFIX = ".autosave"
+compact_entries = 500  # deltas written before the journal is compacted in the autosave
+
+
+class CamJournal(object):
+    """
+    Records the deltas of the edits of a cam file
+    """
+
+    def __init__(self, file_name):
+        """
+        Creates the journal of file_name, nothing is written until the journal has a base
+        """
+
+        self.__file_name = file_name
+        self.__lines = []
+        self.__dropped = 0
+        self.__fh = None
+        self.__enabled = True
+        self.__owned = False
+        self.__lock = threading.Lock()
+
+    def autosave_name(self):
+        """
+        Returns the full name of the autosave file
+        """
+
+        return self.__file_name + AUTOSAVE_SUFFIX
+
+    def close(self, remove=False):
+        """
+        Closes the journal, with remove deletes the journal and the autosave files
+        unless they belong to another editor
+        """
+
+        remove = remove and self.__enabled and not self.in_use()
+        with self.__lock:
+            if self.__fh is not None:
+                self.__fh.close()
+                self.__fh = None
+            if remove:
+                for name in (self.journal_name(), self.autosave_name()):
+                    if os.path.exists(name):
+                        os.remove(name)
+
+    def disable(self):
+        """
+        Stops recording the deltas, the journal and the autosave files are left as they are
+        """
+
+        with self.__lock:
+            self.__enabled = False
+            if self.__fh is not None:
+                self.__fh.close()
+                self.__fh = None
+
+    def enabled(self):
+        """
+        Returns True if the deltas are recorded
+        """
+
+        return self.__enabled
+
+    def entries(self):
+        """
+        Returns the number of deltas recorded after the base
+        """
+
+        return len(self.__lines)
+
+    def exists(self):
+        """
+        Returns True if a journal was left by an editor that did not close, or is written by an editor
+        still running, see in_use
+        """
+
+        return os.path.exists(self.journal_name())
+
+    def file_name(self):
+        """
+        Returns the full name of the cam file
+        """
+
+        return self.__file_name
+
+    def in_use(self):
+        """
+        Returns True if the journal file is written by another editor still running,
+        the editors of other hosts are taken as running
+        """
+
+        owner = None if self.__owned else self.owner()
+        if owner is None:
+            return False
+        if owner["host"] != socket.gethostname():
+            return True
+        return owner["pid"] == os.getpid() or process_alive(owner["pid"])
+
+    def journal_name(self):
+        """
+        Returns the full name of the journal file
+        """
+
+        return self.__file_name + JOURNAL_SUFFIX
+
+    def owner(self):
+        """
+        Returns the dictionary of the pid and the host of the editor writing the journal file,
+        None without a journal file or an owner
+        """
+
+        try:
+            with open(self.journal_name(), encoding="utf-8") as fh:
+                header = json.loads(fh.readline())
+            return {"pid": int(header["pid"]), "host": str(header["host"])}
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+
+    def position(self):
+        """
+        Returns the number of deltas recorded since the journal was created
+        """
+
+        return self.__dropped + len(self.__lines)
+
+    def rebase(self, base_name, position):
+        """
+        Restarts the journal from base_name, just written with the deltas up to position applied,
+        the deltas recorded while base_name was written are kept.
+        The first rebase takes the journal file over, raises IOError if another editor writes it
+        """
+
+        if not self.__enabled:
+            return
+        if self.in_use():
+            owner = self.owner()
+            raise IOError("{0} is written by another editor, process {1} on {2}".format(
+                os.path.basename(self.journal_name()), owner["pid"], owner["host"]))
+        stat = os.stat(base_name)
+        header = {"base": os.path.basename(base_name), "size": stat.st_size, "mtime": stat.st_mtime_ns,
+                  "pid": os.getpid(), "host": socket.gethostname()}
+        with self.__lock:
+            self.__lines = self.__lines[max(0, position - self.__dropped):]
+            self.__dropped = max(self.__dropped, position)
+            if self.__fh is not None:
+                self.__fh.close()
+                self.__fh = None
+            camdata.write_file(self.journal_name(),
+                               ["".join([json.dumps(header) + "\n"] + self.__lines).encode("utf-8")])
+            self.__owned = True
+            self.__fh = open(self.journal_name(), 'a', encoding="utf-8")
+        if base_name != self.autosave_name() and os.path.exists(self.autosave_name()):
+            os.remove(self.autosave_name())
+
+    def record(self, deltas):
+        """
+        Appends the deltas to the journal, returns the number of deltas recorded after the base
+        """
+
+        lines = [json.dumps(delta) + "\n" for delta in deltas]
+        with self.__lock:
+            if not self.__enabled:
+                return 0
+            self.__lines.extend(lines)
+            if self.__fh is not None:
+                self.__fh.writelines(lines)
+                self.__fh.flush()
+            return len(self.__lines)
+
+    def recover(self, cam):
+        """
+        Loads the base of the journal in cam and applies the deltas,
+        returns the number of deltas applied
+        """
+
+        with open(self.journal_name(), encoding="utf-8") as fh:
+            lines = fh.read().splitlines()
+        if not lines:
+            return 0
+        header = json.loads(lines[0])
+        base_name = os.path.join(os.path.dirname(self.__file_name), header["base"])
+        if base_name not in (self.__file_name, self.autosave_name()):
+            raise IOError("the journal is not based on {0}".format(os.path.basename(self.__file_name)))
+        stat = os.stat(base_name)
+        if (stat.st_size, stat.st_mtime_ns) != (header["size"], header["mtime"]):
+            raise IOError("{0} changed after the journal was written".format(header["base"]))
+
+        cam.load(base_name)
+        cam.set_file_name(self.__file_name)
+        count = 0
+        # a truncated last line is the edit interrupted by the crash
+        for line in lines[1:]:
+            try:
+                delta = json.loads(line)
+            except ValueError:
+                break
+            apply_delta(cam, delta)
+            count += 1
+        cam.set_dirty(True)
+        return count
+
+    def started(self):
+        """
+        Returns True if the journal file is written by this journal
+        """
+
+        return self.__fh is not None
+
+
+def apply_delta(cam, delta):
+    """
+    Applies a journal delta to the cam
+    """
+
+    operation = delta[0]
+    if operation == "cam_set":
+        cam.set_speed(delta[1])
+        cam.set_radius(delta[2])
+    elif operation == "mirror":
+        cam.mirror()
+    elif operation == "profile_add":
+        _, label, color, height, depth, points = delta
+        cam_profile = camdata.CamProfile([camdata.CamPoint(*point) for point in points], label, color)
+        cam_profile.set_height(height)
+        cam_profile.set_depth(depth)
+        cam.add_cam(cam_profile)
+    elif operation == "profile_delete":
+        del cam[delta[1]]
+    else:
+        cam_profile = cam[delta[1]]
+        if operation == "check":
+            cam_profile.check_cam()
+        elif operation == "point_add":
+            cam_profile.add_point(camdata.CamPoint(*delta[2:]))
+        elif operation == "point_delete":
+            cam_profile.del_point(find_point(cam_profile, delta[2]))
+        elif operation == "point_set":
+            point = find_point(cam_profile, delta[2])
+            point.set_angle(delta[3])
+            point.set_displacement(delta[4])
+            point.set_law(delta[5])
+        elif operation == "points_move":
+            # the points are found before any of them is moved
+            for point in [find_point(cam_profile, angle) for angle in delta[2]]:
+                point.move(delta[3], delta[4])
+        elif operation == "profile_move":
+            cam_profile.move(delta[2])
+        elif operation == "profile_set":
+            _, _, label, color, height, depth = delta
+            cam_profile.set_label(label)
+            cam_profile.set_color(color)
+            cam_profile.set_height(height)
+            cam_profile.set_depth(depth)
+        else:
+            raise ValueError("unknown journal delta {0}".format(operation))
+
+
+def cam_set_delta(cam):
+    """
+    Returns the delta of the cam settings
+    """
+
+    return ["cam_set", cam.speed(), cam.radius()]
+
+
+def check_delta(cam, cam_profile):
+    """
+    Returns the delta of the check of a profile
+    """
+
+    return ["check", cam.index(cam_profile)]
+
+
+def find_point(cam_profile, angle):
+    """
+    Returns the point of cam_profile at angle
+    """
+
+    for point in cam_profile:
+        if point.angle() == angle:
+            return point
+    raise KeyError("no point at {0} in {1}".format(angle, cam_profile.label()))
+
+
+def mirror_delta():
+    """
+    Returns the delta of the cam mirroring
+    """
+
+    return ["mirror"]
+
+
+def point_add_delta(cam, cam_profile, point):
+    """
+    Returns the delta of the point added to cam_profile
+    """
+
+    return ["point_add", cam.index(cam_profile), point.angle(), point.displacement(), point.law()]
+
+
+def point_delete_delta(cam, cam_profile, point):
+    """
+    Returns the delta of the point removed from cam_profile
+    """
+
+    return ["point_delete", cam.index(cam_profile), point.angle()]
+
+
+def point_set_delta(cam, cam_profile, angle, point):
+    """
+    Returns the delta of the point of cam_profile that was at angle
+    """
+
+    return ["point_set", cam.index(cam_profile), angle, point.angle(), point.displacement(), point.law()]
+
+
+def points_move_delta(cam, cam_profile, angles, delta_angle, delta_displacement):
+    """
+    Returns the delta of the points of cam_profile at angles moved together
+    """
+
+    return ["points_move", cam.index(cam_profile), angles, delta_angle, delta_displacement]
+
+
+def process_alive(pid):
+    """
+    Returns True if the process pid of this host is running
+    """
+
+    if os.name == "nt":
+        import ctypes
+        kernel32 = ctypes.WinDLL("kernel32", use_last_error=True)
+        # PROCESS_QUERY_LIMITED_INFORMATION, signals would terminate the process on Windows
+        handle = kernel32.OpenProcess(0x1000, False, pid)
+        if not handle:
+            # ERROR_ACCESS_DENIED: the process runs under another user
+            return ctypes.get_last_error() == 5
+        code = ctypes.c_ulong()
+        running = kernel32.GetExitCodeProcess(handle, ctypes.byref(code)) and code.value == 259  # STILL_ACTIVE
+        kernel32.CloseHandle(handle)
+        return bool(running)
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def profile_add_delta(cam_profile):
+    """
+    Returns the delta of the profile appended to the cam
+    """
+
+    return ["profile_add", cam_profile.label(), cam_profile.color(), cam_profile.height(), cam_profile.depth(),
+            [[point.angle(), point.displacement(), point.law()] for point in cam_profile]]
+
+
+def profile_delete_delta(index):
+    """
+    Returns the delta of the profile removed from index
+    """
+
+    return ["profile_delete", index]
+
+
+def profile_move_delta(cam, cam_profile, translation):
+    """
+    Returns the delta of the profile translation
+    """
+
+    return ["profile_move", cam.index(cam_profile), translation]
+
+
+def profile_set_delta(cam, cam_profile):
+    """
+    Returns the delta of the profile settings
+    """
+
+    return ["profile_set", cam.index(cam_profile), cam_profile.label(), cam_profile.color(), cam_profile.height(),
+            cam_profile.depth()]
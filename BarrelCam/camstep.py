@@ -0,0 +1,307 @@
+# Copyright 2022 Simone <sanfe75@gmail.com>
+#
+# Licensed under the Apache License, Version 2.0(the "License"); you may not use this file except
+# in compliance with the License.You may obtain a copy of the License at:
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software distributed under the License is distributed
+# on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the License
+# for the specific language governing permissions and limitations under the License.
+#
+
+"""
+STEP export, imported only when a cam is exported to STEP
+"""
+
+import os
+
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+
+from cadquery import Edge, Shape, Solid, Vector, Workplane
+from numpy import (arange, arctan2, argmax, array, ceil, clip, column_stack, concatenate, cos, diff, flatnonzero, full,
+                   inf, linspace, minimum, pi, searchsorted, sin, sqrt, unique, unwrap)
+
+from BarrelCam import camcache, camdata
+
+drum_margin = 1.0  # millimetres the groove tools stand out of the drum, the faces of a cut must not coincide
+spine_refinements = 8  # times the worst samples are added to the spine before giving up on the tolerance
+
+
+def congruent_profiles(cam):
+    """
+    Returns for every profile of the cam the index of the first congruent profile and the axial offset
+    of the profile from it
+
+    Two profiles are congruent if they have the same height, depth, angles and laws and their displacements
+    differ by a constant, like a profile and its copy moved by CamProfile.move
+    """
+
+    grooves = {}
+    congruent = []
+    for i, cam_profile in enumerate(cam):
+        records = camdata.points_to_records(cam_profile)
+        base = records["displacement"][0]
+        # the offsets of the moved copies differ in the last bits
+        shape = (cam_profile.height(), cam_profile.depth(), records["angle"].tobytes(), records["law"].tobytes(),
+                 tuple(round(displacement - base, 9) for displacement in records["displacement"].tolist()))
+        first, first_base = grooves.setdefault(shape, (i, base))
+        congruent.append((first, float(base - first_base)))
+    return congruent
+
+
+def drum_body(cam, length, bore=None):
+    """
+    Returns the drum cylinder of the cam radius and length, from the drum face at displacement 0
+    along the grooves, and the tool of the bore of diameter bore, None without a bore or with a bore of 0
+    """
+
+    camdata.check_drum(cam, length, bore)
+    body = Solid.makeCylinder(cam.radius(), length, Vector(0, 0, -length))
+    bore_tool = None
+    if bore:
+        bore_tool = Solid.makeCylinder(bore / 2, length + 2 * drum_margin, Vector(0, 0, -length - drum_margin))
+    return body, bore_tool
+
+
+def from_brep(brep):
+    """
+    Returns the shape read from the BREP bytes
+    """
+
+    return Shape.importBrep(BytesIO(brep))
+
+
+def profile_spines(radius, points, depth, angle_pitch, tolerance=None):
+    """
+    Returns the points of the path and of the auxiliary spine of the profile samples and the maximum distance
+    of the samples from the path
+
+    Without a tolerance a sample is taken every angle_pitch degrees and the distance is None,
+    with a tolerance in millimetres the samples are chosen by spine_indexes
+    """
+
+    polyline = []
+    aux = []
+    deviation = None
+    if tolerance is None:
+        # the last sample closes the ring even if the pitch does not divide the turn
+        indexes = list(range(0, len(points) - 1, angle_pitch * 10)) + [len(points) - 1]
+    else:
+        indexes, deviation = spine_indexes(radius, points, tolerance)
+
+    for j in indexes:
+        polyline.append((radius * cos(points[j][0] * (pi / 180)),
+                        radius * sin(points[j][0] * (pi / 180)), -points[j][1]))
+        aux.append(((radius - depth) * cos(points[j][0] * (pi / 180)),
+                    (radius - depth) * sin(points[j][0] * (pi / 180)), -points[j][1]))
+    return polyline, aux, deviation
+
+
+def save_3D_STP(cam, file_name, angle_pitch, jobs=None, tolerance=None, cache=None, drum_length=None, bore=None,
+                mp_context=None):
+    """
+    Exports the cam to file_name in STEP format
+
+    The spines take a sample every angle_pitch degrees or, with a tolerance in millimetres, the samples
+    needed to keep the path within the tolerance from every sample of the profile.
+    Only the first of the congruent profiles is swept, the others are its solid translated along the axis.
+    The profiles are swept in jobs worker processes (all the cores if None), started with mp_context
+    (the default start method if None), and joined with a balanced tree of unions.
+    With a camcache.SolidCache the solids of the profiles swept before are read from the cache,
+    only the other profiles are swept and stored in it.
+    With a drum_length in millimetres the file has the drum of the cam radius and drum_length instead,
+    with a bore of diameter bore if not None: the grooves, swept drum_margin out of the drum,
+    and the bore are cut from the drum cylinder in a single boolean
+    """
+
+    radius = cam.radius()
+    margin = 0
+    if drum_length is not None:
+        body, bore_tool = drum_body(cam, drum_length, bore)
+        margin = drum_margin
+    congruent = congruent_profiles(cam)
+    swept = [i for i, (first, _) in enumerate(congruent) if first == i]
+    profiles = {i: (radius, cam[i].polyline_array(True), cam[i].depth(), angle_pitch, tolerance) for i in swept}
+    breps = dict.fromkeys(swept)
+    if cache is not None:
+        keys = {i: camcache.profile_key(cam, cam[i], angle_pitch, tolerance, margin) for i in swept}
+        breps = {i: cache.get(keys[i]) for i in swept}
+    missing = [i for i in swept if breps[i] is None]
+
+    if len(cam) == 1 or jobs == 1:
+        spines = [profile_spines(*profiles[i]) for i in missing]
+        shapes = {i: from_brep(brep) for i, brep in breps.items() if brep is not None}
+        for i, arguments in zip(missing, sweep_arguments(radius, [cam[i] for i in missing], spines, margin)):
+            shapes[i] = sweep(*arguments)
+            if cache is not None:
+                cache.put(keys[i], to_brep(shapes[i]))
+        grooves = [shapes[first].translate((0, 0, -offset)) if offset else shapes[first]
+                   for first, offset in congruent]
+        if drum_length is None:
+            result = union_tree(grooves)
+    else:
+        with ProcessPoolExecutor(max_workers=jobs, mp_context=mp_context) as executor:
+            spines = list(executor.map(profile_spines, *zip(*[profiles[i] for i in missing])))
+            sweeps = sweep_arguments(radius, [cam[i] for i in missing], spines, margin)
+            for i, brep in zip(missing, executor.map(sweep_brep, *zip(*sweeps))):
+                breps[i] = brep
+                if cache is not None:
+                    cache.put(keys[i], brep)
+            if drum_length is None:
+                breps = [to_brep(from_brep(breps[first]).translate((0, 0, -offset))) if offset else breps[first]
+                         for first, offset in congruent]
+                while len(breps) > 1:
+                    # every level of the tree joins the shapes in pairs, the odd one goes to the next level
+                    unions = executor.map(union_brep, breps[0:-1:2], breps[1::2])
+                    breps = list(unions) + ([breps[-1]] if len(breps) % 2 else [])
+                result = from_brep(breps[0])
+            else:
+                shapes = {i: from_brep(breps[i]) for i in swept}
+                grooves = [shapes[first].translate((0, 0, -offset)) if offset else shapes[first]
+                           for first, offset in congruent]
+    if drum_length is not None:
+        # one boolean with every tool intersects each groove with the faces of the drum only,
+        # sequential cuts intersect it with the faces left by all the grooves cut before
+        result = body.cut(*grooves, *([bore_tool] if bore_tool is not None else []))
+
+    result.exportStep(file_name)
+    message = "Cam saved to {0}".format(os.path.basename(file_name))
+    if tolerance is not None and spines:
+        message += ", {0} spine points, max deviation {1:.4f} mm".format(
+            sum(len(polyline) for polyline, _, _ in spines), max(deviation for _, _, deviation in spines))
+    if len(swept) < len(cam):
+        message += ", {0} of {1} solids translated from congruent profiles".format(len(cam) - len(swept), len(cam))
+    if cache is not None:
+        message += ", {0} of {1} solids from the cache".format(len(swept) - len(missing), len(swept))
+    if drum_length is not None:
+        message += ", drum {0:g} x {1:g} mm{2} with {3} grooves cut in one boolean".format(
+            2 * radius, drum_length, ", bore {0:g} mm".format(bore) if bore else "", len(cam))
+    return True, message
+
+
+def spine_deviations(radius, points, indexes):
+    """
+    Returns the distance of every sample of the profile from the path interpolating the samples at indexes,
+    the path is measured on four points per sample
+    """
+
+    angles = points[:, 0] * (pi / 180)
+    samples = column_stack((radius * cos(angles), radius * sin(angles), -points[:, 1]))
+    # the last index closes the ring of the periodic path on the first one
+    curve = Edge.makeSpline([Vector(*samples[j]) for j in indexes[:-1]], periodic=True)._geomAdaptor()
+    parameters = linspace(curve.FirstParameter(), curve.LastParameter(), 4 * len(points))
+    path = array([(point.X(), point.Y(), point.Z()) for point in map(curve.Value, parameters)])
+    path_angles = unwrap(arctan2(path[:, 1], path[:, 0]))
+    if (diff(path_angles) <= 0).any():
+        return full(len(points), inf)
+
+    # the nearest chord of the path may be the one before or after the angle of the sample
+    index = searchsorted(path_angles, angles)
+    distances = None
+    for offset in (-1, 0, 1):
+        end = clip(index + offset, 1, len(path) - 1)
+        start = path[end - 1]
+        chord = path[end] - start
+        relative = samples - start
+        t = clip((relative * chord).sum(axis=1) / (chord * chord).sum(axis=1), 0, 1)
+        chord_distances = sqrt(((relative - t[:, None] * chord) ** 2).sum(axis=1))
+        distances = chord_distances if distances is None else minimum(distances, chord_distances)
+    return distances
+
+
+def spine_indexes(radius, points, tolerance):
+    """
+    Returns the indexes of the samples of the spine of the profile and the maximum distance of the samples
+    from the path within tolerance
+
+    The samples start from a coarse decimation of the profile, spaced to keep a cubic spline on the cylinder
+    within the tolerance, then the worst sample between two spine points is added until the path is
+    within the tolerance
+    """
+
+    # the spline follows the profile closer than the decimated polyline
+    indexes, _ = camdata.decimate(points, radius, tolerance * 32)
+    # error of a cubic spline on a circle of the radius with a step of h radians: radius * h ** 4 / 384
+    max_step = max(1, int((384 * tolerance / radius) ** 0.25 * (180 / pi) / (points[1][0] - points[0][0])))
+    steps = ceil(diff(indexes) / max_step).astype(int)
+    indexes = unique(concatenate([linspace(first, last, count + 1).astype(int)
+                                  for first, last, count in zip(indexes[:-1], indexes[1:], steps)]))
+
+    for _ in range(spine_refinements):
+        distances = spine_deviations(radius, points, indexes)
+        spans = searchsorted(indexes, arange(len(points)), side="right") - 1
+        wrong = unique(spans[distances > tolerance])
+        if len(wrong) == 0:
+            break
+        added = []
+        for span in wrong:
+            span_samples = flatnonzero(spans == span)
+            added.append(span_samples[argmax(distances[span_samples])])
+        indexes = unique(concatenate((indexes, added)))
+    else:
+        distances = spine_deviations(radius, points, indexes)
+    return indexes.tolist(), float(distances.max())
+
+
+def sweep(radius, depth, height, polyline, aux):
+    """
+    Returns the solid of the groove section swept along the path with the auxiliary spine,
+    the last points of the spines close the rings on the first ones
+    """
+
+    section = Workplane("XZ").move(radius - depth/2, polyline[0][2]).rect(depth, height)
+    # periodic splines join the ends with the same tangent, an open spline closed on itself leaves
+    # a kink that the sweep caps with two faces and the solid fails the booleans
+    path = Workplane("XY").spline(polyline[:-1], periodic=True)
+    aux_spine = Workplane("XY").spline(aux[:-1], periodic=True)
+
+    return section.sweep(path, auxSpine=aux_spine).val()
+
+
+def sweep_arguments(radius, cam_profiles, spines, margin=0):
+    """
+    Returns the arguments of sweep for the profiles on the cylinder of the radius and their spines,
+    the sections stand margin millimetres out of the cylinder
+    """
+
+    return [(radius + margin, cam_profile.depth() + margin, cam_profile.height(), polyline, aux)
+            for cam_profile, (polyline, aux, _) in zip(cam_profiles, spines)]
+
+
+def sweep_brep(radius, depth, height, polyline, aux):
+    """
+    Worker process function, returns the BREP bytes of the swept solid
+    """
+
+    return to_brep(sweep(radius, depth, height, polyline, aux))
+
+
+def to_brep(shape):
+    """
+    Returns the BREP bytes of the shape
+    """
+
+    stream = BytesIO()
+    shape.exportBrep(stream)
+    return stream.getvalue()
+
+
+def union_brep(brep, other_brep):
+    """
+    Worker process function, returns the BREP bytes of the union of the two shapes
+    """
+
+    return to_brep(from_brep(brep).fuse(from_brep(other_brep)).clean())
+
+
+def union_tree(shapes):
+    """
+    Returns the union of the shapes, joined in pairs with a balanced tree
+    """
+
+    while len(shapes) > 1:
+        shapes = [shapes[i].fuse(shapes[i + 1]).clean() for i in range(0, len(shapes) - 1, 2)] + \
+                 ([shapes[-1]] if len(shapes) % 2 else [])
+    return shapes[0]
@@ -0,0 +1,349 @@
+# Copyright 2022 Simone <sanfe75@gmail.com>
+#
+# Licensed under the Apache License, Version 2.0(the "License"); you may not use this file except
+# in compliance with the License.You may obtain a copy of the License at:
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software distributed under the License is distributed
+# on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the License
+# for the specific language governing permissions and limitations under the License.
+#
+
+"""
+Binary STL export of the grooved drum, built with numpy only
+"""
+
+import os
+
+from numpy import arange, arccos, arctan2, argmax, argmin, argsort, ceil, concatenate, cos, cross, cumsum, diff, \
+    dtype, einsum, empty, float32, floor, full, hypot, interp, linspace, maximum, pi, roll, sin, stack, uint32, \
+    unique, unwrap, zeros, zeros_like
+
+from BarrelCam import camdata
+
+STL_DTYPE = dtype([("normal", "<f4", (3,)), ("vertices", "<f4", (3, 3)), ("attribute", "<u2")])
+STL_HEADER = b"BarrelCam binary STL".ljust(80, b" ")
+
+# corners of the groove section: floor and top on the lower wall, top and floor on the upper wall
+_SECTION_ = ((0, -1), (1, -1), (1, 1), (0, 1))
+# corners of the top on the lower and on the upper wall, the edges of the groove opening on the drum
+_LOWER_TOP_, _UPPER_TOP_ = 1, 2
+_MARGIN_ = 1.0  # millimetres the drum is meshed past the grooves that run out of it, before the clip
+
+
+def default_drum_length(cam):
+    """
+    Returns the default length of the drum: the deepest groove with half a groove height of drum below it
+    """
+
+    return max((cam_profile.max_displacement() + cam_profile.height() for cam_profile in cam), default=0.0)
+
+
+def drum_triangles(cam, tolerance=None, drum_length=None, bore=None):
+    """
+    Returns the (N, 3, 3) array of the triangles of the drum with the grooves cut, turned outwards
+
+    The drum is a cylinder of the cam radius and drum_length, default_drum_length by default, from the drum face
+    at displacement 0 along the grooves, with a bore of diameter bore if not None and not 0.
+    The grooves are meshed as groove_triangles, the cylinder between the grooves joins the edges of their tops
+    and the circles of the ends, sampled as the grooves. A drum the grooves run out of is meshed past them
+    and clipped at its ends
+    """
+
+    radius = cam.radius()
+    length = default_drum_length(cam) if drum_length is None else drum_length
+    camdata.check_drum(cam, length, bore)
+    grooves = [groove_sections(radius, cam_profile, tolerance) for cam_profile in cam]
+    # from the drum face down, the grooves must not cross each other
+    grooves.sort(key=lambda sections: -sections[:, :, 2].mean())
+    for upper, lower in zip(grooves[:-1], grooves[1:]):
+        _check_apart(_loop(upper[:, _LOWER_TOP_]), _loop(lower[:, _UPPER_TOP_]))
+    # the ends of the mesh before the clip
+    top = max((sections[:, :, 2].max() for sections in grooves), default=-length)
+    top = 0 if top < 0 else top + _MARGIN_
+    bottom = min((sections[:, :, 2].min() for sections in grooves), default=0)
+    bottom = -length if bottom > -length else bottom - _MARGIN_
+
+    if tolerance is None:
+        count = 360 * camdata.angle_steps
+    else:
+        count = int(ceil(pi / arccos(1 - min(tolerance, radius) / radius)))
+    face, end = _circle(radius, top, count), _circle(radius, bottom, count)
+    # the cylinder between the drum face, the grooves and the drum end
+    loops = [face]
+    for sections in grooves:
+        loops += [_loop(sections[:, _UPPER_TOP_]), _loop(sections[:, _LOWER_TOP_])]
+    loops.append(end)
+    triangles = [_turned(_zip(upper, lower), "outer") for upper, lower in zip(loops[::2], loops[1::2])]
+    for sections in grooves:
+        walls = _section_triangles(sections, (0, 2, 3))
+        # the walls face the groove, inwards to the groove solid
+        if signed_volume(_section_triangles(sections, range(4))) > 0:
+            walls = walls[:, ::-1]
+        triangles.append(walls)
+    if bore:
+        face_bore, end_bore = _circle(bore / 2, top, count), _circle(bore / 2, bottom, count)
+        triangles += [_turned(_zip(face, face_bore), "face"), _turned(_zip(end, end_bore), "end"),
+                      _turned(_zip(face_bore, end_bore), "bore")]
+    else:
+        triangles += [_turned(_fan(face), "face"), _turned(_fan(end), "end")]
+    triangles = concatenate(triangles)
+
+    if top != 0:
+        triangles, segments = _clipped(triangles, 0, "face")
+        triangles = concatenate((triangles, _cap(segments, bool(bore), "face")))
+    if bottom != -length:
+        triangles, segments = _clipped(triangles, -length, "end")
+        triangles = concatenate((triangles, _cap(segments, bool(bore), "end")))
+    return triangles
+
+
+def groove_sections(radius, cam_profile, tolerance=None):
+    """
+    Returns the (N, 4, 3) array of the sections of the groove of cam_profile, a corner of _SECTION_ each
+
+    The groove has the floor at radius - depth, the top on the cylinder of the radius and the walls at half
+    the height from the profile, measured across the path unrolled on the floor and on the top cylinders.
+    Every sample of the profile is a section, with a tolerance in millimetres the samples are decimated
+    and spaced to keep the facets of the cylinder within the tolerance
+    """
+
+    points = cam_profile.polyline_array(True)
+    if tolerance is not None:
+        indexes, _ = camdata.decimate(points, radius, tolerance)
+        # chord of the cylinder within tolerance
+        max_step = 2 * arccos(1 - min(tolerance, radius) / radius) * (180 / pi) / (points[1][0] - points[0][0])
+        steps = ceil(diff(indexes) / max(1, int(max_step))).astype(int)
+        indexes = unique(concatenate([linspace(first, last, count + 1).astype(int)
+                                      for first, last, count in zip(indexes[:-1], indexes[1:], steps)]))
+        points = points[indexes]
+    # the last sample closes the ring on the first one
+    angles = points[:-1, 0] * (pi / 180)
+    z = -points[:-1, 1]
+    step = roll(angles, -1) - roll(angles, 1)
+    step[0] += 2 * pi
+    step[-1] += 2 * pi
+    rise = roll(z, -1) - roll(z, 1)
+
+    half_height = cam_profile.height() / 2
+    sections = empty((len(angles), 4, 3))
+    for corner, (top, side) in enumerate(_SECTION_):
+        corner_radius = radius - cam_profile.depth() * (1 - top)
+        # normal of the path unrolled on the cylinder of the corner
+        length = hypot(corner_radius * step, rise)
+        corner_angles = angles - side * half_height * rise / length / corner_radius
+        sections[:, corner, 0] = corner_radius * cos(corner_angles)
+        sections[:, corner, 1] = corner_radius * sin(corner_angles)
+        sections[:, corner, 2] = z + side * half_height * corner_radius * step / length
+    return sections
+
+
+def groove_triangles(radius, cam_profile, tolerance=None):
+    """
+    Returns the (N, 3, 3) array of the triangles of the closed groove of cam_profile, the solid the STEP export
+    sweeps, from the sections of groove_sections
+    """
+
+    return _section_triangles(groove_sections(radius, cam_profile, tolerance), range(4))
+
+
+def save_3D_STL(cam, file_name, tolerance=None, drum_length=None, bore=None):
+    """
+    Exports the drum of the cam with the grooves cut to file_name in binary STL format
+
+    The drum is the cylinder of drum_triangles, with a tolerance in millimetres the sections are decimated
+    """
+
+    length = default_drum_length(cam) if drum_length is None else drum_length
+    triangles = drum_triangles(cam, tolerance, length, bore)
+    normals = cross(triangles[:, 1] - triangles[:, 0], triangles[:, 2] - triangles[:, 0])
+    lengths = hypot(hypot(normals[:, 0], normals[:, 1]), normals[:, 2])
+    lengths[lengths == 0] = 1
+
+    records = zeros(len(triangles), dtype=STL_DTYPE)
+    records["normal"] = (normals / lengths[:, None]).astype(float32)
+    records["vertices"] = triangles.astype(float32)
+    camdata.write_file(file_name, [STL_HEADER, uint32(len(records)).tobytes(), records.tobytes()])
+    return True, "Cam saved to {0}, {1} triangles, drum {2:g} x {3:g} mm{4} with {5} grooves".format(
+        os.path.basename(file_name), len(records), 2 * cam.radius(), length,
+        ", bore {0:g} mm".format(bore) if bore else "", len(cam))
+
+
+def signed_volume(triangles):
+    """
+    Returns the volume enclosed by the triangles, negative if they are turned inwards
+    """
+
+    return float((cross(triangles[:, 0], triangles[:, 1]) * triangles[:, 2]).sum() / 6)
+
+
+def _cap(segments, bore, side):
+    """
+    Returns the triangles of the drum end cut by _clipped, from its segments: the outer loop zipped to the loop
+    of the bore or closed on its centre
+    """
+
+    loops = [_loop(points) for points in _chained(segments)]
+    if len(loops) != (2 if bore else 1):
+        raise ValueError("The grooves split the drum {0}".format(side))
+    loops.sort(key=lambda loop: -hypot(loop[0][:, 0], loop[0][:, 1]).max())
+    return _turned(_zip(*loops) if bore else _fan(loops[0]), side)
+
+
+def _chained(segments):
+    """
+    Returns the (N, 3) arrays of the points of the closed loops the (M, 2, 3) segments are chained in,
+    counterclockwise around the axis
+    """
+
+    # the cuts of an edge are computed once for both its triangles, the points match exactly
+    _, ends = unique(segments.reshape(-1, 3), axis=0, return_inverse=True)
+    ends = ends.reshape(-1, 2)
+    starting = empty(ends.max() + 1, dtype=int)
+    starting[ends[:, 0]] = arange(len(segments))
+    following = starting[ends[:, 1]].tolist()
+    loops = []
+    chained = [False] * len(segments)
+    for first in range(len(segments)):
+        index, loop = first, []
+        while not chained[index]:
+            chained[index] = True
+            loop.append(index)
+            index = following[index]
+        if loop:
+            points = segments[loop, 0]
+            area = (points[:, 0] * roll(points[:, 1], -1) - roll(points[:, 0], -1) * points[:, 1]).sum()
+            loops.append(points if area > 0 else points[::-1])
+    return loops
+
+
+def _check_apart(upper, lower):
+    """
+    Raises ValueError if the upper edge of the lower groove reaches the lower edge of the upper groove
+    """
+
+    angles = concatenate((upper[1], lower[1]))
+    upper_z = interp(angles, upper[1], upper[0][:, 2], period=2 * pi)
+    lower_z = interp(angles, lower[1], lower[0][:, 2], period=2 * pi)
+    if (upper_z <= lower_z).any():
+        raise ValueError("The grooves must not cross each other")
+
+
+def _circle(radius, z, count):
+    """
+    Returns the loop of count points of the circle of the radius at z
+    """
+
+    angles = arange(count) * (2 * pi / count)
+    return stack((radius * cos(angles), radius * sin(angles), full(count, float(z))), axis=1), angles
+
+
+def _clipped(triangles, z, side):
+    """
+    Returns the triangles clipped by the plane at z, keeping the part below the "face" side or above the "end"
+    side, and the (M, 2, 3) segments of the cut, each cut edge computed from its inner to its outer point
+    """
+
+    distances = (triangles[:, :, 2] - z) * (1 if side == "face" else -1)
+    inside = distances < 0
+    counts = inside.sum(axis=1)
+    clipped = [triangles[counts == 3]]
+    segments = []
+    for kept in (1, 2):
+        selected = counts == kept
+        # the vertex alone on its side first, in the order of the triangle
+        first = argmax(inside[selected] if kept == 1 else ~inside[selected], axis=1)
+        order = (first[:, None] + arange(3)) % 3
+        rows = arange(len(order))[:, None]
+        vertices = triangles[selected][rows, order]
+        vertex_distances = distances[selected][rows, order]
+        cuts = []
+        for other in (1, 2):
+            inner, outer = (0, other) if kept == 1 else (other, 0)
+            ratio = vertex_distances[:, inner] / (vertex_distances[:, inner] - vertex_distances[:, outer])
+            cut = vertices[:, inner] + ratio[:, None] * (vertices[:, outer] - vertices[:, inner])
+            cut[:, 2] = z
+            cuts.append(cut)
+        first_cut, second_cut = cuts
+        if kept == 1:
+            clipped.append(stack((vertices[:, 0], first_cut, second_cut), axis=1))
+            segments.append(stack((first_cut, second_cut), axis=1))
+        else:
+            clipped.append(stack((first_cut, vertices[:, 1], vertices[:, 2]), axis=1))
+            clipped.append(stack((first_cut, vertices[:, 2], second_cut), axis=1))
+            segments.append(stack((second_cut, first_cut), axis=1))
+    return concatenate(clipped), concatenate(segments)
+
+
+def _fan(loop):
+    """
+    Returns the triangles closing the loop on its centre
+    """
+
+    points, _ = loop
+    centre = zeros_like(points)
+    centre[:, 2] = points[:, 2]
+    return stack((centre, points, roll(points, -1, axis=0)), axis=1)
+
+
+def _loop(points):
+    """
+    Returns the points counterclockwise around the axis from the first at the least angle, and their angles
+    unwrapped from [0, 2 pi)
+    """
+
+    first = argmin(arctan2(points[:, 1], points[:, 0]) % (2 * pi))
+    points = roll(points, -first, axis=0)
+    angles = unwrap(arctan2(points[:, 1], points[:, 0]))
+    return points, angles - 2 * pi * floor(angles[0] / (2 * pi))
+
+
+def _section_triangles(sections, corners):
+    """
+    Returns the triangles of the groove faces from the corners to the next corners of sections
+    """
+
+    following = roll(sections, -1, axis=0)
+    triangles = []
+    for corner in corners:
+        next_corner = (corner + 1) % 4
+        a, b = sections[:, corner], sections[:, next_corner]
+        c, d = following[:, next_corner], following[:, corner]
+        triangles.append(stack((a, b, c), axis=1))
+        triangles.append(stack((a, c, d), axis=1))
+    return concatenate(triangles)
+
+
+def _turned(triangles, side):
+    """
+    Returns the triangles turned towards the side: "outer" away from the axis, "bore" towards the axis,
+    "face" up the axis and "end" down the axis
+    """
+
+    normals = cross(triangles[:, 1] - triangles[:, 0], triangles[:, 2] - triangles[:, 0])
+    centres = triangles.mean(axis=1)
+    if side in ("outer", "bore"):
+        facing = einsum("ij,ij->", normals[:, :2], centres[:, :2]) * (1 if side == "outer" else -1)
+    else:
+        facing = normals[:, 2].sum() * (1 if side == "face" else -1)
+    return triangles if facing > 0 else triangles[:, ::-1]
+
+
+def _zip(first, second):
+    """
+    Returns the strip of triangles between two loops around the axis, advancing on the loop of the nearer
+    following point
+    """
+
+    (a, a_angles), (b, b_angles) = first, second
+    # a loop turning back, as a cut wall leaning over, keeps its order
+    a_angles, b_angles = maximum.accumulate(a_angles), maximum.accumulate(b_angles)
+    # every step goes to the next point of a loop, the last points close on the first ones
+    following = concatenate((a_angles[1:], [a_angles[0] + 2 * pi], b_angles[1:], [b_angles[0] + 2 * pi]))
+    on_a = argsort(following, kind="stable") < len(a)
+    i = (cumsum(on_a) - on_a) % len(a)
+    j = (cumsum(~on_a) - ~on_a) % len(b)
+    i_next, j_next = (i + 1) % len(a), (j + 1) % len(b)
+    return concatenate((stack((a[i[on_a]], a[i_next[on_a]], b[j[on_a]]), axis=1),
+                        stack((a[i[~on_a]], b[j_next[~on_a]], b[j[~on_a]]), axis=1)))
@@ -11,8 +11,8 @@
 #
 
 from numpy import arctan, linspace, pi
-from PySide6.QtCore import QPoint, QRect, QRectF, Qt, Signal, QPointF
-from PySide6.QtGui import QBrush, QFont, QFontMetrics, QPainter, QPen, QPainterPath
+from PySide6.QtCore import QPoint, QRect, QRectF, Qt, QTimer, Signal, QPointF
+from PySide6.QtGui import QBrush, QColor, QFont, QFontMetrics, QPainter, QPen, QPainterPath
 from PySide6.QtWidgets import QGraphicsItem, QGraphicsView, QGraphicsScene, QMessageBox, QSizePolicy, QTableWidget, \
     QTableWidgetItem
 
@@ -181,28 +181,29 @@ class CamProfileItem(QGraphicsItem):
         if self.isSelected():
             pen.setColor(Qt.red)
         else:
-            pen.setColor(self.cam_profile.color())
+            pen.setColor(QColor(self.cam_profile.color()))
         pen.setWidth(pen_width)
+        if not self.cam_profile.loaded():
+            pen.setStyle(Qt.DashLine)
         painter.setPen(pen)
 
-        polyline = self.cam_profile.polyline(False, self.angle_steps)
-        i = 0
+        if self.cam_profile.loaded():
+            polyline = self.cam_profile.polyline_array(False, self.angle_steps).tolist()
+            i = 0
 
-        while i < len(polyline) - 1:
-            painter.drawLine(polyline[i][0] * self.angle_steps, polyline[i][1] * self.displacement_steps,
-                             polyline[i + 1][0] * self.angle_steps, polyline[i + 1][1] * self.displacement_steps)
-            i += 1
+            while i < len(polyline) - 1:
+                painter.drawLine(polyline[i][0] * self.angle_steps, polyline[i][1] * self.displacement_steps,
+                                 polyline[i + 1][0] * self.angle_steps, polyline[i + 1][1] * self.displacement_steps)
+                i += 1
+        else:
+            painter.drawRect(self.__placeholder())
 
         label_font = QFont()
         label_font.setPointSizeF(5 * self.angle_steps)
         label_font.setBold(True)
         painter.setFont(label_font)
-        if self.cam_profile[-1].displacement() > self.cam_profile[0].displacement():
-            y_position = self.displacement_steps * (self.cam_profile[-1].displacement() + 6)
-        else:
-            y_position = self.displacement_steps * (self.cam_profile[-1].displacement() - 2)
 
-        painter.drawText(OFFSET, y_position, self.cam_profile.label())
+        painter.drawText(OFFSET, self.__label_position(), self.cam_profile.label())
 
     def shape(self):
         """
@@ -213,12 +214,7 @@ class CamProfileItem(QGraphicsItem):
 
         shape_increase = 3
         path = QPainterPath()
-        polyline = self.cam_profile.polyline(False, self.angle_steps)
-
-        if self.cam_profile[-1].displacement() > self.cam_profile[0].displacement():
-            y_position = self.displacement_steps * (self.cam_profile[-1].displacement() + 6)
-        else:
-            y_position = self.displacement_steps * (self.cam_profile[-1].displacement() - 2)
+        y_position = self.__label_position()
 
         label_font = QFont()
         label_font.setPointSizeF(5 * self.angle_steps)
@@ -230,6 +226,12 @@ class CamProfileItem(QGraphicsItem):
                      font_metrics.boundingRect(self.cam_profile.label()).width(),
                      font_metrics.boundingRect(self.cam_profile.label()).height())
 
+        if not self.cam_profile.loaded():
+            path.addRect(self.__placeholder().adjusted(0, -shape_increase * self.displacement_steps,
+                                                       0, shape_increase * self.displacement_steps))
+            return path
+
+        polyline = self.cam_profile.polyline_array(False, self.angle_steps).tolist()
         i = 0
         while i < len(polyline) - 1:
             path.addRect(polyline[i][0] * self.angle_steps,                                                       #x
@@ -240,6 +242,27 @@ class CamProfileItem(QGraphicsItem):
 
         return path
 
+    def __label_position(self):
+        """
+        Returns the y of the label, below the displacements of a profile whose points are not read yet
+        """
+
+        if not self.cam_profile.loaded():
+            return self.displacement_steps * (self.cam_profile.max_displacement() + 6)
+        if self.cam_profile[-1].displacement() > self.cam_profile[0].displacement():
+            return self.displacement_steps * (self.cam_profile[-1].displacement() + 6)
+        return self.displacement_steps * (self.cam_profile[-1].displacement() - 2)
+
+    def __placeholder(self):
+        """
+        Returns the band of the displacements of the profile table, drawn until CamScene.load_pending
+        reads the points of a lazy profile
+        """
+
+        return QRectF(0, self.cam_profile.min_displacement() * self.displacement_steps, 360 * self.angle_steps,
+                      (self.cam_profile.max_displacement() - self.cam_profile.min_displacement())
+                      * self.displacement_steps)
+
 
 class CamScene(QGraphicsScene):
     """
@@ -248,6 +271,7 @@ class CamScene(QGraphicsScene):
 
     camChanged = Signal()
     pointChanged = Signal()
+    profileLoaded = Signal(object)
 
     def __init__(self, parent=None):
         """
@@ -264,6 +288,12 @@ class CamScene(QGraphicsScene):
         self.angle_steps = self.parent.cam.angle_steps()
         self.displacement_steps = self.parent.cam.displacement_steps()
 
+        # the points of the lazy profiles are added one profile every event loop cycle
+        self.__pending = []
+        self.__load_timer = QTimer(self)
+        self.__load_timer.setInterval(0)
+        self.__load_timer.timeout.connect(self.load_pending)
+
         self.update_scene()
 
     def add_grid(self):
@@ -298,6 +328,30 @@ class CamScene(QGraphicsScene):
                 self.addLine(0, y * self.displacement_steps, 360 * self.angle_steps, y * self.displacement_steps,
                              tick_pen)
 
+    def clear(self):
+        """
+        Removes the items of the scene and stops loading the lazy profiles of the removed items
+        """
+
+        self.__load_timer.stop()
+        self.__pending = []
+        super(CamScene, self).clear()
+
+    def load_pending(self):
+        """
+        Reads the points of the next lazy profile and adds its point items
+        """
+
+        if self.__pending:
+            cam_profile_item = self.__pending.pop(0)
+            for point in cam_profile_item.get_profile():
+                CamPointItem(point, cam_profile_item, self)
+            # the placeholder is replaced by the polyline
+            cam_profile_item.update()
+            self.profileLoaded.emit(cam_profile_item.get_profile())
+        if not self.__pending:
+            self.__load_timer.stop()
+
     def modified(self):
         """
         Sets the cam modified and update the main_window
@@ -370,8 +424,14 @@ class CamScene(QGraphicsScene):
             for cam_profile in self.parent.cam:
                 cam_profile_item = CamProfileItem(cam_profile, self)
 
-                for point in cam_profile:
-                    CamPointItem(point, cam_profile_item, self)
+                if cam_profile.loaded():
+                    for point in cam_profile:
+                        CamPointItem(point, cam_profile_item, self)
+                else:
+                    self.__pending.append(cam_profile_item)
+
+            if self.__pending:
+                self.__load_timer.start()
 
 
 class CamView(QGraphicsView):
@@ -465,22 +525,18 @@ class GraphsWidget(FigureCanvas):
         else:
             plots = [profiles_plot, first_derivative_plot, second_derivative_plot]
 
+        displacements = []
         for cam_profile in self.cam:
-            polyline = cam_profile.polyline(True)
-            x = [xi[0] for xi in polyline]
-            y = [-xi[1] for xi in polyline]
-            profiles_plot.plot(x, y, label=cam_profile.label(), color=cam_profile.color().getRgbF())
+            x, displacement, first_derivative, second_derivative = cam_profile.kinematics()
+            displacements.append(displacement)
+            profiles_plot.plot(x, -displacement, label=cam_profile.label(), color=cam_profile.color())
             profiles_plot.set_ylabel('Displacement $[mm]$')
-            first_derivative = cam_profile.first_derivative()
-            x = [xi[0] for xi in first_derivative]
-            y = [(180 / pi) * arctan((xi[1]) / self.radius) for xi in first_derivative]
-            first_derivative_plot.plot(x, y, label=cam_profile.label(), color=cam_profile.color().getRgbF())
+            y = (180 / pi) * arctan(first_derivative / self.radius)
+            first_derivative_plot.plot(x, y, label=cam_profile.label(), color=cam_profile.color())
             first_derivative_plot.set_ylabel('Slope [°]')
-            second_derivative = cam_profile.second_derivative()
-            x = [xi[0] for xi in second_derivative]
-            y = [(self.speed ** 2) * xi[1] / 1000 for xi in second_derivative]
+            y = (self.speed ** 2) * second_derivative / 1000
             color = "black"
-            if self.max_acc is not None and max(y) > self.max_acc:
+            if self.max_acc is not None and y.max() > self.max_acc:
                 color = "red"
                 error_dialog = QMessageBox()
                 error_dialog.setIcon(QMessageBox.Warning)
@@ -490,11 +546,11 @@ class GraphsWidget(FigureCanvas):
                                                 .format(self.max_acc))
                 error_dialog.setStandardButtons(QMessageBox.Ok)
                 error_dialog.exec()
-            second_derivative_plot.plot(x, y, label=cam_profile.label(), color=cam_profile.color().getRgbF())
+            second_derivative_plot.plot(x, y, label=cam_profile.label(), color=cam_profile.color())
             second_derivative_plot.set_ylabel('Acceleration $[m/s^2]$')
 
-            y_max = max(y)
-            x_max = x[y.index(y_max)]
+            y_max = y.max()
+            x_max = x[y.argmax()]
             x_max_disp = -50
             if x_max < 180:
                 x_max_disp = +50
@@ -503,8 +559,8 @@ class GraphsWidget(FigureCanvas):
                                             arrowprops=dict(arrowstyle="->", connectionstyle="arc3,rad=.2"),
                                             color=color)
 
-            y_min = min(y)
-            x_min = x[y.index(y_min)]
+            y_min = y.min()
+            x_min = x[y.argmin()]
             x_min_disp = -50
             if x_min < 180:
                 x_min_disp = +50
@@ -515,15 +571,13 @@ class GraphsWidget(FigureCanvas):
 
         if len(self.cam) > 1:
             for i, cam_profile in enumerate(self.cam):
-                polyline = cam_profile.polyline(True)
-                x = [xi[0] for xi in polyline]
                 if i > 0:
-                    differences = [abs(y[1] - y0[j]) for j, y in enumerate(polyline)]
-                    y_min = min(differences)
-                    x_min = x[differences.index(y_min)]
-                    y_max = max(differences)
-                    x_max = x[differences.index(y_max)]
-                    distances_plot.plot(x, differences, label=cam_profile.label(), color=cam_profile.color().getRgbF())
+                    differences = abs(displacements[i] - displacements[0])
+                    y_min = differences.min()
+                    x_min = x[differences.argmin()]
+                    y_max = differences.max()
+                    x_max = x[differences.argmax()]
+                    distances_plot.plot(x, differences, label=cam_profile.label(), color=cam_profile.color())
 
                     x_max_disp = -50
                     if x_max < 180:
@@ -569,8 +623,6 @@ class GraphsWidget(FigureCanvas):
                                             arrowprops=dict(arrowstyle="->", connectionstyle="arc3,rad=.2"),
                                             color=color)
                     distances_plot.scatter([x_max, x_min], [y_max, y_min])
-                else:
-                    y0 = [xi[1] for xi in polyline]
                 distances_plot.set_ylabel('Distances $[mm]$')
 
         for plot in plots:
@@ -606,10 +658,13 @@ class TableCamWidget(QTableWidget):
         """
 
         self.clearSelection()
-        self.setRowCount(len(self.profile))
+        # the rows of a lazy profile are added when its points are read
+        self.setRowCount(len(self.profile) if self.profile.loaded() else 0)
         self.setColumnCount(3)
         self.setHorizontalHeaderLabels(["Angle", "Displacement", "Law"])
         self.setEditTriggers(QTableWidget.NoEditTriggers)
+        if not self.profile.loaded():
+            return
         for row, cam_point in enumerate(self.profile):
             angle = QTableWidgetItem(str(cam_point.angle()))
             displacement = QTableWidgetItem(str(cam_point.displacement()))
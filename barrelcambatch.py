@@ -0,0 +1,236 @@
+# BarrelCam Batch Exporter
+#
+# Copyright 2022 Simone <sanfe75@gmail.com>
+#
+# Licensed under the Apache License, Version 2.0(the "License"); you may not use this file except
+# in compliance with the License.You may obtain a copy of the License at:
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software distributed under the License is distributed
+# on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the License
+# for the specific language governing permissions and limitations under the License.
+#
+
+"""
+Exports .cam and .cxf files without the GUI
+
+Example: python barrelcambatch.py "drums/**/*.cam" -o release -f dxf csv stp stl
+"""
+
+import argparse
+import glob
+import os
+import sys
+
+from concurrent.futures import ProcessPoolExecutor
+
+from BarrelCam import camcache, camdata
+
+FORMATS = ("dxf", "csv", "stp", "stl")
+DEFAULT_FORMATS = ("dxf", "csv", "stp")
+
+
+def export_base(file_name, output=None):
+    """Build the name of the exported files without the extension.
+
+    Parameters:
+    file_name (str): the .cam or .cxf file to export
+    output (str): the output directory, None to write next to file_name
+
+    Return:
+    str: the file_name base name in the output directory
+    """
+
+    directory = output if output is not None else os.path.dirname(file_name)
+    return os.path.join(directory, os.path.splitext(os.path.basename(file_name))[0])
+
+
+def export_file(file_name, output=None, formats=DEFAULT_FORMATS, angle_pitch=6, decimal_point=".", jobs=1, layout="long",
+                tolerance=None, splines=False, dxf_version=None, stp_tolerance=None, cache=True, drum_length=None,
+                bore=None):
+    """Export a cam file in the given formats.
+
+    Parameters:
+    file_name (str): the .cam or .cxf file to export
+    output (str): the output directory, None to write next to file_name
+    formats (tuple): the formats to export
+    angle_pitch (int): the angle pitch of the STP splines
+    decimal_point (str): the decimal separator of the CSV files
+    jobs (int): the number of processes sweeping the STP profiles
+    layout (str): the layout of the CSV files, long or wide
+    tolerance (float): the chordal tolerance in mm of the DXF, CSV and STL sections, None to keep every sample
+    splines (bool): export the DXF law segments as splines and the dwells as lines
+    dxf_version (str): the AutoCAD version of the DXF files, None for AC1015
+    stp_tolerance (float): the tolerance in mm of the STP spines, None to sample them every angle_pitch degrees
+    cache (bool): read the STP solids swept before from the solid cache and store the new ones
+    drum_length (float): the length in mm of the drum the grooves are cut from, None to export the STP grooves
+                         and the STL drum below the deepest groove
+    bore (float): the diameter in mm of the bore of the STP and STL drums, None for a solid drum
+
+    Return:
+    bool: a boolean to represent if all the exports were successful
+    list: the messages
+    """
+
+    messages = []
+    try:
+        cam = load_file(file_name)
+        if len(cam) == 0:
+            return False, ["{0}: no profiles to export".format(file_name)]
+        base_name = export_base(file_name, output)
+        for extension in formats:
+            export_name = "{0}.{1}".format(base_name, extension)
+            if extension == "dxf":
+                _, message = cam.save_2D_DXF(export_name, tolerance, splines, dxf_version)
+            elif extension == "csv":
+                _, message = cam.save_2D_CSV(export_name, decimal_point, layout, tolerance=tolerance)
+            elif extension == "stp":
+                _, message = cam.save_3D_STP(export_name, angle_pitch, jobs, stp_tolerance,
+                                             camcache.SolidCache() if cache else None, drum_length, bore)
+            elif extension == "stl":
+                _, message = cam.save_3D_STL(export_name, tolerance, drum_length, bore)
+            else:
+                raise ValueError("unknown format {0}".format(extension))
+            messages.append("{0}: {1}".format(file_name, message))
+    except Exception as e:
+        messages.append("{0}: {1}".format(file_name, e))
+        return False, messages
+    return True, messages
+
+
+def find_collisions(file_names, output=None):
+    """Find the files that would export to the same files.
+
+    Parameters:
+    file_names (list): the .cam and .cxf files to export
+    output (str): the output directory, None to write next to each file
+
+    Return:
+    list: the lists of file names exported to the same files
+    """
+
+    exports = {}
+    for file_name in file_names:
+        base_name = os.path.normcase(os.path.abspath(export_base(file_name, output)))
+        exports.setdefault(base_name, []).append(file_name)
+    return [names for names in exports.values() if len(names) > 1]
+
+
+def find_files(patterns):
+    """Expand the glob patterns.
+
+    Parameters:
+    patterns (list): the glob patterns, ** matches any subdirectory
+
+    Return:
+    list: the .cam and .cxf files, without duplicates
+    """
+
+    file_names = []
+    for pattern in patterns:
+        for file_name in sorted(glob.glob(pattern, recursive=True)):
+            if os.path.splitext(file_name)[1].lower() in (".cam", ".cxf") and file_name not in file_names:
+                file_names.append(file_name)
+    return file_names
+
+
+def load_file(file_name):
+    """Load a .cam or a .cxf file.
+
+    Parameters:
+    file_name (str): the full name of the file
+
+    Return:
+    Cam: the cam loaded
+    """
+
+    cam = camdata.Cam()
+    if file_name[-4:].lower() == ".cxf":
+        cam.set_file_name(file_name[:-4] + ".cam")
+        result, message = cam.load_cxf_file(file_name)
+    else:
+        result, message = cam.load(file_name)
+    if not result:
+        raise IOError(message)
+    return cam
+
+
+def main(argv=None):
+    """Parse the command line and export the files.
+
+    Return:
+    int: the exit status, 1 if at least one export failed
+    """
+
+    parser = argparse.ArgumentParser(description="Export Barrel Cam files without the GUI")
+    parser.add_argument("patterns", nargs="*", help="files or glob patterns of .cam and .cxf files")
+    parser.add_argument("-o", "--output", help="output directory, by default next to each file")
+    parser.add_argument("-f", "--formats", nargs="+", choices=FORMATS, default=list(DEFAULT_FORMATS),
+                        help="formats to export")
+    parser.add_argument("-p", "--pitch", type=int, default=6, help="angle pitch of the STP splines in degrees")
+    parser.add_argument("--stp-tolerance", type=float,
+                        help="choose the STP spline points to keep the grooves within this tolerance in mm, "
+                             "instead of the pitch")
+    parser.add_argument("--drum-length", type=float,
+                        help="export the STP drum of this length in mm with the grooves cut, instead of the grooves, "
+                             "and the STL drum of this length instead of ending below the deepest groove")
+    parser.add_argument("--bore", type=float, help="diameter in mm of the bore of the STP and STL drums")
+    parser.add_argument("-d", "--decimal-point", default=".", help="decimal separator of the CSV files")
+    parser.add_argument("-l", "--layout", choices=("long", "wide"), default="long",
+                        help="CSV layout, profiles one after the other or side by side")
+    parser.add_argument("-t", "--tolerance", type=float,
+                        help="decimate the DXF, CSV and STL sections within this chordal tolerance in mm")
+    parser.add_argument("-s", "--splines", action="store_true",
+                        help="export the DXF law segments as splines fitted within the tolerance")
+    parser.add_argument("-v", "--dxf-version", help="AutoCAD version of the DXF files, AC1009 to AC1027 or "
+                                                     "R12 to R2013, AC1015 by default")
+    parser.add_argument("--no-cache", action="store_true", help="sweep every STP solid, without the solid cache")
+    parser.add_argument("--clear-cache", action="store_true",
+                        help="remove the STP solids of the cache in {0}".format(camcache.CACHE_DIR))
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count(), help="number of worker processes")
+    args = parser.parse_args(argv)
+    if args.bore is not None and args.drum_length is None and "stl" not in args.formats:
+        parser.error("--bore needs --drum-length or the STL format")
+
+    if args.clear_cache:
+        count, removed = camcache.SolidCache().clear()
+        print("Removed {0} solids, {1:.1f} MB from the cache".format(count, removed / 2 ** 20))
+        if not args.patterns:
+            return 0
+
+    file_names = find_files(args.patterns)
+    if not file_names:
+        parser.error("no .cam or .cxf files found")
+    collisions = find_collisions(file_names, args.output)
+    if collisions:
+        parser.error("files exported to the same names, rename them or export them separately: " +
+                     "; ".join(", ".join(names) for names in collisions))
+    if args.output is not None:
+        os.makedirs(args.output, exist_ok=True)
+
+    failed = 0
+    # with a single file the workers sweep its profiles, otherwise every worker exports a whole file
+    parallel_files = args.jobs > 1 and len(file_names) > 1
+    arguments = [(file_name, args.output, args.formats, args.pitch, args.decimal_point,
+                  1 if parallel_files else args.jobs, args.layout, args.tolerance, args.splines,
+                  args.dxf_version, args.stp_tolerance, not args.no_cache, args.drum_length, args.bore)
+                 for file_name in file_names]
+    if parallel_files:
+        with ProcessPoolExecutor(max_workers=args.jobs) as executor:
+            results = executor.map(export_file, *zip(*arguments))
+            for result, messages in results:
+                failed += not result
+                print("\n".join(messages))
+    else:
+        for argument in arguments:
+            result, messages = export_file(*argument)
+            failed += not result
+            print("\n".join(messages))
+
+    print("Exported {0} of {1} files".format(len(file_names) - failed, len(file_names)))
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -12,12 +12,14 @@
 # for the specific language governing permissions and limitations under the License.
 #
 
+import multiprocessing
 import os
 import platform
 import PySide6
 import sys
 
-from PySide6.QtCore import QEvent, QFile, QFileInfo, QMargins, QSettings, QSize, Qt
+from concurrent.futures import ThreadPoolExecutor
+from PySide6.QtCore import QEvent, QFile, QFileInfo, QLocale, QMargins, QSettings, QSize, Qt, Signal
 from PySide6.QtGui import QAction, QIcon, QKeySequence, QPageLayout, QPainter, QUndoStack
 from PySide6.QtPrintSupport import QPrintDialog, QPrinter
 from PySide6.QtWidgets import QApplication, QDockWidget, QFileDialog, QGridLayout, QInputDialog, QMainWindow, \
@@ -29,7 +31,7 @@ sys.path.insert(0, '.')
 
 import qrcresources
 
-from BarrelCam import camcmd, camdata, camdlg, camwidget
+from BarrelCam import camcache, camcmd, camdata, camdlg, camjournal, camwidget
 
 __author__ = 'simone.sanfelici'
 __version__ = "0.9.4"
@@ -45,6 +47,8 @@ class BarrelCamEditor(QMainWindow):
     next_id = 1
     recent_files = []
 
+    saveFinished = Signal(bool, str)
+
     def __init__(self, file_name=None, parent=None):
         """
         Main Window Constructor
@@ -54,9 +58,18 @@ class BarrelCamEditor(QMainWindow):
         self.setAttribute(Qt.WA_DeleteOnClose)
         BarrelCamEditor.instances.append(self)
 
+        # the saves of a window are written in order, the windows save concurrently
+        self.save_executor = ThreadPoolExecutor(max_workers=1)
+        self.saveFinished.connect(self.save_finished)
+
         self.undo_stack = QUndoStack()
         self.undo_stack.canUndoChanged.connect(self.update_ui)
         self.undo_stack.canRedoChanged.connect(self.update_ui)
+        self.undo_stack.indexChanged.connect(self.journal_commands)
+        self.journal = None
+        self.journal_index = 0
+        self.journal_compacting = False
+        self.journal_recovered = False
         self.cam = camdata.Cam()
         self.selected_points = []
         self.selected_cams = []
@@ -64,24 +77,32 @@ class BarrelCamEditor(QMainWindow):
         self.min_distance = None
         self.max_distance = None
         self.STP_angle_pitch = 6
-
+        self.STP_tolerance = None
+        self.STP_jobs = os.cpu_count() or 1
+        self.STP_drum_length = None
+        self.STP_bore = 0.0
+        self.export_tolerance = None
+        self.DXF_splines = False
+
+        message = "Ready"
         if file_name is None:
             self.cam.set_file_name("Unnamed-{0}".format(BarrelCamEditor.next_id))
             BarrelCamEditor.next_id += 1
             self.cam.set_dirty(False)
         else:
             if file_name[-4:].lower() == ".cam":
-                _, message = self.cam.load(file_name)
+                _, message = self.cam.load(file_name, lazy=True)
+                message = self.open_journal() or message
             elif file_name[-4:].lower() == ".cxf":
                 self.cam.set_file_name(file_name[:-4] + ".cam")
                 _, message = self.cam.load_cxf_file(file_name)
-            self.statusBar().showMessage(message, 5000)
 
         self.view = camwidget.CamView(self)
         self.view.viewResized.connect(self.update_zoom)
         self.scene = camwidget.CamScene(self)
         self.scene.selectionChanged.connect(self.update_ui)
         self.scene.pointChanged.connect(self.update_widgets)
+        self.scene.profileLoaded.connect(self.update_table)
         self.view.setScene(self.scene)
         self.setCentralWidget(self.view)
         self.view.setContextMenuPolicy(Qt.ActionsContextMenu)
@@ -124,6 +145,10 @@ class BarrelCamEditor(QMainWindow):
                                                       icon="file_export_2d", tip="Export 2D CSV")
         file_export_3DSTP_action = self.create_action("Export &3D STP...", self.file_export_3DSTP,
                                                       icon="file_export_3d", tip="Export 3D STP")
+        file_export_3DSTL_action = self.create_action("Export 3D ST&L...", self.file_export_3DSTL,
+                                                      icon="file_export_3d", tip="Export 3D STL")
+        file_clear_cache_action = self.create_action("&Clear 3D STP Cache", self.file_clear_cache,
+                                                     tip="Remove the solids kept for the 3D STP exports")
         file_print_action = self.create_action("&Print", self.file_print, QKeySequence.Print, "file_print",
                                                "Print the cam scheme")
         file_quit_action = self.create_action("&Quit", self.file_quit, "Ctrl+Q",
@@ -174,7 +199,8 @@ class BarrelCamEditor(QMainWindow):
         # Menus Creation
         self.file_menu = self.menuBar().addMenu("&File")
         self.export_menu = self.file_menu.addMenu(QIcon(":/file_export.png"), "&Export")
-        self.add_actions(self.export_menu, (file_export_2DDXF_action, file_export_2DCSV_action, file_export_3DSTP_action))
+        self.add_actions(self.export_menu, (file_export_2DDXF_action, file_export_2DCSV_action, file_export_3DSTP_action,
+                                           file_export_3DSTL_action, None, file_clear_cache_action))
         self.file_menu_actions = (file_new_action, file_open_action, file_close_action, None, file_save_action,
                                   file_save_as_action, file_save_all_action, None, self.export_menu, None, file_print_action,
                                   file_quit_action)
@@ -231,7 +257,8 @@ class BarrelCamEditor(QMainWindow):
                           self.edit_cam_edit_action, self.edit_cam_move_action, self.edit_mirror_action,
                           self.edit_point_add_action, self.edit_point_edit_action, self.edit_delete_action))
 
-        self.update_status("Ready")
+        # the load or the journal message, the journal of a file open in another editor is not replayed
+        self.update_status(message)
         self.load_settings()
         self.update_ui()
         self.update_widgets()
@@ -322,6 +349,9 @@ class BarrelCamEditor(QMainWindow):
 
         if self.ok_to_continue():
             
+            self.save_executor.shutdown(wait=True)
+            if self.journal is not None:
+                self.journal.close(remove=True)
             self.scene.clear()
             settings = QSettings()
             if BarrelCamEditor.recent_files:
@@ -335,6 +365,12 @@ class BarrelCamEditor(QMainWindow):
             settings.setValue("Limits/min_distance", self.min_distance)
             settings.setValue("Limits/max_distance", self.max_distance)
             settings.setValue("Settings/STP_angle_pitch", self.STP_angle_pitch)
+            settings.setValue("Settings/STP_tolerance", self.STP_tolerance)
+            settings.setValue("Settings/STP_jobs", self.STP_jobs)
+            settings.setValue("Settings/STP_drum_length", self.STP_drum_length)
+            settings.setValue("Settings/STP_bore", self.STP_bore)
+            settings.setValue("Settings/export_tolerance", self.export_tolerance)
+            settings.setValue("Settings/DXF_splines", self.DXF_splines)
             BarrelCamEditor.instances.remove(self)
         else:
             event.ignore()
@@ -522,6 +558,14 @@ class BarrelCamEditor(QMainWindow):
             self.clear_scroll_area()
             self.undo_stack.push(camcmd.PointEditCommand(self, cam_profile, cam_point, dlg.point(), "Cam Point Edited"))
 
+    def file_clear_cache(self):
+        """
+        Removes the solids kept for the 3D STP exports
+        """
+
+        count, removed = camcache.SolidCache().clear()
+        self.update_status("Removed {0} solids, {1:.1f} MB from the cache".format(count, removed / 2 ** 20))
+
     def file_export_2D(self):
         """
         Exports a 2d DXF
@@ -544,7 +588,7 @@ class BarrelCamEditor(QMainWindow):
             extension = file_name[-4:].lower()
             if extension != ".dxf":
                 file_name += ".dxf"
-            result, message = self.cam.save_2D_DXF(file_name)
+            result, message = self.cam.save_2D_DXF(file_name, self.export_tolerance, self.DXF_splines)
         if result:
             self.update_status(message)
 
@@ -570,7 +614,40 @@ class BarrelCamEditor(QMainWindow):
             extension = file_name[-4:].lower()
             if extension != ".csv":
                 file_name += ".csv"
-            self.cam.save_2D_CSV(file_name)
+            result, message = self.cam.save_2D_CSV(file_name, QLocale.system().decimalPoint(),
+                                                   tolerance=self.export_tolerance)
+            if result:
+                self.update_status(message)
+
+    def file_export_3DSTL(self):
+        """
+        Exports a 3d STL
+        """
+
+        if len(self.cam) == 0:
+            error_dialog = QMessageBox()
+            error_dialog.setIcon(QMessageBox.Critical)
+            error_dialog.setWindowTitle("Error")
+            error_dialog.setText("Impossible to export the file.")
+            error_dialog.setInformativeText("You need at least 1 profile to save to STL file.")
+            error_dialog.setStandardButtons(QMessageBox.Ok)
+            error_dialog.exec()
+            return
+
+        directory = self.cam.file_name()[:-4] + ".stl"
+        file_name = QFileDialog.getSaveFileName(self, "Barrel Cam Editor - Export the cam file", directory,
+                                                "STL file (*.stl)")[0]
+        if file_name:
+            extension = file_name[-4:].lower()
+            if extension != ".stl":
+                file_name += ".stl"
+            try:
+                # the drum of the STP settings, or the drum below the deepest groove
+                _, message = self.cam.save_3D_STL(file_name, self.export_tolerance, self.STP_drum_length,
+                                                  self.STP_bore if self.STP_drum_length is not None else None)
+            except ValueError as e:
+                message = "Cam not saved to {0}: {1}".format(QFileInfo(file_name).fileName(), e)
+            self.update_status(message)
 
     def file_export_3DSTP(self):
         """
@@ -594,9 +671,14 @@ class BarrelCamEditor(QMainWindow):
             extension = file_name[-4:].lower()
             if extension != ".stp":
                 file_name += ".stp"
-            result, message = self.cam.save_3D_STP(file_name, self.STP_angle_pitch)
-            if result:
-                self.update_status(message)
+            try:
+                # a fork of the GUI process would copy the state of the Qt and save threads, the workers are spawned
+                _, message = self.cam.save_3D_STP(file_name, self.STP_angle_pitch, self.STP_jobs, self.STP_tolerance,
+                                                  camcache.SolidCache(), self.STP_drum_length, self.STP_bore,
+                                                  multiprocessing.get_context("spawn"))
+            except ValueError as e:
+                message = "Cam not saved to {0}: {1}".format(QFileInfo(file_name).fileName(), e)
+            self.update_status(message)
 
     @staticmethod
     def file_new():
@@ -643,15 +725,34 @@ class BarrelCamEditor(QMainWindow):
 
         QApplication.closeAllWindows()
 
-    def file_save(self):
+    def file_save(self, wait=False):
         """Save a file.
+
+        The cam is copied on the GUI thread and written on the save thread.
+
+        Parameters:
+        wait (bool): wait until the file is written
+
+        Return:
+        bool: a boolean to represent if the save was started, or was successful when waiting
         """
 
         if self.cam.file_name().startswith("Unnamed"):
             self.file_save_as()
         else:
-            self.cam.save()
-            self.update_status("Cam saved as {0}".format(QFileInfo(self.cam.file_name()).fileName()))
+            file_name = self.cam.file_name()
+            if self.journal is None or self.journal.file_name() != file_name:
+                if self.journal is not None:
+                    self.journal.close(remove=True)
+                self.journal = camjournal.CamJournal(file_name)
+                self.journal_recovered = False
+            buffers = self.cam.snapshot()
+            self.cam.set_dirty(False)
+            self.update_status("Saving {0}...".format(QFileInfo(file_name).fileName()))
+            future = self.save_executor.submit(self.write_snapshot, file_name, buffers, self.journal,
+                                               self.journal.position())
+            if wait:
+                return future.result()
             return True
 
     def file_save_all(self):
@@ -663,7 +764,7 @@ class BarrelCamEditor(QMainWindow):
             if window.cam.dirty():
                 if window.file_save():
                     count += 1
-        self.update_status("Saved {0} of {1} files".format(count, len(BarrelCamEditor.instances)))
+        self.update_status("Saving {0} of {1} files".format(count, len(BarrelCamEditor.instances)))
 
     def file_save_as(self):
         """Create the dialog to save a new file.
@@ -702,6 +803,32 @@ class BarrelCamEditor(QMainWindow):
 
         QMessageBox.about(self, "About Barrel Cam Editor", message)
 
+    def journal_commands(self, index):
+        """Record in the journal the deltas of the commands done or undone.
+
+        Parameters:
+        index (int): the new index of the undo stack
+        """
+
+        if index > self.journal_index:
+            commands = [self.undo_stack.command(i) for i in range(self.journal_index, index)]
+        elif index < self.journal_index:
+            commands = [self.undo_stack.command(i) for i in reversed(range(index, self.journal_index))]
+        else:
+            # the pushed command was merged in the last one
+            commands = [self.undo_stack.command(index - 1)] if index > 0 else []
+        self.journal_index = index
+
+        if self.journal is not None and self.journal.enabled():
+            for command in commands:
+                entries = self.journal.record(command.deltas)
+            if commands and not self.journal.started():
+                self.start_journal()
+            elif commands and entries >= camjournal.compact_entries and not self.journal_compacting:
+                self.journal_compacting = True
+                self.save_executor.submit(self.write_autosave, self.journal, self.cam.snapshot(),
+                                          self.journal.position())
+
     def load_file(self, file_name=None):
         """
         If the file is not already opened it opens a new MainWindow with file_name
@@ -715,9 +842,11 @@ class BarrelCamEditor(QMainWindow):
         if not self.check_opened(file_name):
             if not self.cam.dirty() and self.cam.file_name().startswith("Unnamed"):
                 self.cam.set_file_name(file_name)
-                result, message = self.cam.load()
+                result, message = self.cam.load(lazy=True)
                 if result:
-                    self.update_status("Cam loaded from {0}".format(QFileInfo(self.cam.file_name()).fileName()))
+                    message = self.open_journal()
+                    self.update_status(message or "Cam loaded from {0}".format(
+                        QFileInfo(self.cam.file_name()).fileName()))
                     self.scene.update_scene()
                     self.update_widgets()
                     self.update_ui()
@@ -777,6 +906,18 @@ class BarrelCamEditor(QMainWindow):
             self.max_distance = float(settings.value("Limits/max_distance"))
         if settings.value("Settings/STP_angle_pitch") is not None:
             self.STP_angle_pitch = int(settings.value("Settings/STP_angle_pitch"))
+        if settings.value("Settings/STP_tolerance") is not None:
+            self.STP_tolerance = float(settings.value("Settings/STP_tolerance"))
+        if settings.value("Settings/STP_jobs") is not None:
+            self.STP_jobs = int(settings.value("Settings/STP_jobs"))
+        if settings.value("Settings/STP_drum_length") is not None:
+            self.STP_drum_length = float(settings.value("Settings/STP_drum_length"))
+        if settings.value("Settings/STP_bore") is not None:
+            self.STP_bore = float(settings.value("Settings/STP_bore"))
+        if settings.value("Settings/export_tolerance") is not None:
+            self.export_tolerance = float(settings.value("Settings/export_tolerance"))
+        if settings.value("Settings/DXF_splines") is not None:
+            self.DXF_splines = settings.value("Settings/DXF_splines") in (True, "true")
 
         self.scene.set_x_steps(x_steps)
         self.scene.set_y_limit(y_limit)
@@ -795,10 +936,39 @@ class BarrelCamEditor(QMainWindow):
             if reply == QMessageBox.Cancel:
                 return False
             elif reply == QMessageBox.Yes:
-                result = self.file_save()
+                result = self.file_save(wait=True)
                 return result
         return True
 
+    def open_journal(self):
+        """Create the journal of the cam file, replaying the journal left by an editor that did not close.
+
+        Nothing is written until the first edit or save, see start_journal. The journal of a file open
+        in another editor is not replayed and the edits of this window are not journaled.
+
+        Return:
+        str: the recovery message, None if there was nothing to recover
+        """
+
+        file_name = self.cam.file_name()
+        self.journal = camjournal.CamJournal(file_name)
+        self.journal_recovered = False
+        if self.journal.in_use():
+            owner = self.journal.owner()
+            self.journal.disable()
+            return "{0} is open in another editor, process {1} on {2}: the edits are not journaled".format(
+                QFileInfo(file_name).fileName(), owner["pid"], owner["host"])
+        message = None
+        if self.journal.exists():
+            try:
+                count = self.journal.recover(self.cam)
+                self.journal_recovered = True
+                return "Recovered {0} edits of {1}".format(count, QFileInfo(file_name).fileName())
+            except (IOError, OSError, KeyError, ValueError) as e:
+                message = "Journal of {0} not recovered: {1}".format(QFileInfo(file_name).fileName(), e)
+                self.cam.load(file_name, lazy=True)
+        return message
+
     def raise_window(self):
         """Raise and make active editor_to_rise
         """
@@ -823,6 +993,18 @@ class BarrelCamEditor(QMainWindow):
         matrix.scale(factor, factor)
         self.view.setTransform(matrix)
 
+    def save_finished(self, result, message):
+        """Report the end of a save.
+
+        Parameters:
+        result (bool): a boolean to represent if the save was successful
+        message (str): the message for the statusbar
+        """
+
+        if not result:
+            self.cam.set_dirty(True)
+        self.update_status(message)
+
     def settings(self):
         """
         Shows settings dialog
@@ -847,6 +1029,21 @@ class BarrelCamEditor(QMainWindow):
             self.scene.set_y_limit(y_limit)
             self.scene.set_y_steps(y_steps)
             self.STP_angle_pitch = dlg.pitch_spinbox.value()
+            self.STP_jobs = dlg.jobs_spinbox.value()
+            if dlg.stp_tolerance_checkbox.isChecked():
+                self.STP_tolerance = dlg.stp_tolerance_spinbox.value()
+            else:
+                self.STP_tolerance = None
+            if dlg.drum_checkbox.isChecked():
+                self.STP_drum_length = dlg.drum_length_spinbox.value()
+            else:
+                self.STP_drum_length = None
+            self.STP_bore = dlg.bore_spinbox.value()
+            if dlg.tolerance_checkbox.isChecked():
+                self.export_tolerance = dlg.tolerance_spinbox.value()
+            else:
+                self.export_tolerance = None
+            self.DXF_splines = dlg.splines_checkbox.isChecked()
             if dlg.acc_checkbox.isChecked():
                 self.max_acceleration = dlg.acc_limit_spinbox.value()
             else:
@@ -860,6 +1057,24 @@ class BarrelCamEditor(QMainWindow):
             else:
                 self.max_distance = None
 
+    def start_journal(self):
+        """Write the journal of the cam file on the first recorded edit.
+
+        The recovered edits are written in the autosave file the journal starts from, otherwise the journal
+        starts from the cam file. If the journal cannot be written the edits of this window are not journaled.
+        """
+
+        try:
+            if self.journal_recovered:
+                camdata.write_file(self.journal.autosave_name(), self.cam.snapshot())
+                self.journal.rebase(self.journal.autosave_name(), self.journal.position())
+            else:
+                self.journal.rebase(self.journal.file_name(), 0)
+        except (IOError, OSError) as e:
+            self.journal.disable()
+            self.update_status("The edits of {0} are not journaled: {1}".format(
+                QFileInfo(self.journal.file_name()).fileName(), e))
+
     def update_file_menu(self):
         """
         Dynamically creates the file menu
@@ -910,6 +1125,21 @@ class BarrelCamEditor(QMainWindow):
         self.setWindowModified(self.cam.dirty())
         self.printer.setDocName(QFileInfo(self.cam.file_name()).fileName())
 
+    def update_table(self, cam_profile):
+        """Update the table of a profile.
+
+        Parameters:
+        cam_profile (CamProfile): the profile whose points were read
+        """
+
+        if self.scroll_area.widget() is None:
+            return
+        layout = self.scroll_area.widget().layout()
+        for i in range(layout.count()):
+            table = layout.itemAt(i).widget()
+            if isinstance(table, camwidget.TableCamWidget) and table.profile is cam_profile:
+                table.update()
+
     def update_ui(self):
         """
         Dynamically enable the actions depending on the selected items
@@ -1057,6 +1287,52 @@ class BarrelCamEditor(QMainWindow):
             instance.resize(width, height)
             left += width
 
+    def write_autosave(self, journal, buffers, position):
+        """Compact the journal in the autosave file, called on the save thread.
+
+        Parameters:
+        journal (CamJournal): the journal to compact
+        buffers (list): the snapshot of the cam
+        position (int): the journal position of the snapshot
+        """
+
+        try:
+            camdata.write_file(journal.autosave_name(), buffers)
+            journal.rebase(journal.autosave_name(), position)
+        except (IOError, OSError) as e:
+            journal.disable()
+            self.saveFinished.emit(False, "Autosave failed, the edits are not journaled: {0}".format(e))
+        finally:
+            self.journal_compacting = False
+
+    def write_snapshot(self, file_name, buffers, journal=None, position=0):
+        """Write a cam snapshot, called on the save thread.
+
+        Parameters:
+        file_name (str): the full name of the file
+        buffers (list): the snapshot of the cam
+        journal (CamJournal): the journal to restart from the saved file
+        position (int): the journal position of the snapshot
+
+        Return:
+        bool: a boolean to represent if the save was successful
+        """
+
+        try:
+            camdata.write_file(file_name, buffers)
+        except (IOError, OSError) as e:
+            self.saveFinished.emit(False, "Failed to save {0}: {1}".format(QFileInfo(file_name).fileName(), e))
+            return False
+        message = "Cam saved as {0}".format(QFileInfo(file_name).fileName())
+        if journal is not None:
+            try:
+                journal.rebase(file_name, position)
+            except (IOError, OSError) as e:
+                journal.disable()
+                message += ", the edits are not journaled: {0}".format(e)
+        self.saveFinished.emit(True, message)
+        return True
+
 
 if __name__ == "__main__":
     APP = QApplication(sys.argv)